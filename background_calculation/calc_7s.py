@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
 import pandas as pd
+import numpy as np
 import argparse
 import sys
+from coverage_track import is_track, read_track
 
 
 # calculate mean coverage of each bin
@@ -13,6 +15,16 @@ def calc_coverage(frs):
         freqs[name] = {
             '7s':0, 'Total':0, 'Other':0
         }
+        # binary coverage track
+        if is_track(fr):
+            for cov in read_track(fr).values():
+                # bed end coordinate of each base
+                loc = np.arange(1, len(cov)+1)
+                in_7s = (loc <= 191) | (loc > 16106)
+                freqs[name]['Total'] += int(cov.sum(dtype=np.int64))
+                freqs[name]['7s'] += int(cov[in_7s].sum(dtype=np.int64))
+                freqs[name]['Other'] += int(cov[~in_7s].sum(dtype=np.int64))
+            continue
         for l in fr:
             ws = l.rstrip('\n').split('\t')
             if len(ws) < 3:
@@ -39,7 +51,7 @@ def calc_coverage(frs):
 def main():
     # argparse
     parser = argparse.ArgumentParser(description='Draw background coverage for DNA seq')
-    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='Coverage bed file')
+    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='Coverage bed file or binary coverage track')
     parser.add_argument('-o', type=argparse.FileType('w'), default=sys.stdout, help='Output to file')
     args = parser.parse_args()
 
@@ -1,8 +1,11 @@
 #!/usr/bin/env python3
 
-from collections import defaultdict
+from multiprocessing import Pool
+import numpy as np
 import argparse
 import sys
+import os
+from coverage_track import write_track
 
 # read chromosome sizes
 def read_fai(fr):
@@ -13,88 +16,231 @@ def read_fai(fr):
     return data
 
 
-def main():
-    # argparse
-    parser = argparse.ArgumentParser(description='Calculate the DNA-seq coverage at each coordinate')
-    parser.add_argument('sam',type=argparse.FileType('r'), help='Aligned filtered sam file')
-    parser.add_argument('fai',type=argparse.FileType('r'), help='Corresponding fasta index file')
-    parser.add_argument('-o', default=sys.stdout, type=argparse.FileType('w'), help='Output to file')
-    parser.add_argument('--covered_only', action='store_true', help='Only output covered items')
-    parser.add_argument('--compact', action='store_true', help='Output in compacted format, in this way, all chromsomes are treated as linear')
-    parser.add_argument('--max_insert_size', default=1000, help='Maximum insert size allowed (1000nt)')
-    args = parser.parse_args()
+# determine fragment strand from SAM flag
+def get_strand(flag):
+    # first read
+    if flag % 128 // 64:
+        if flag % 32 // 16:
+            return '+'
+        else:
+            return '-'
+    elif flag % 32 // 16:
+        return '-'
+    else:
+        return '+'
 
-    # get chrom sizes
-    sizes = read_fai(args.fai)
 
-    # Use the algorithom for "merge interval" question
-    # Initiate each chromosome and strand
-    data = {}
-    for k, v in sizes.items():
-        for st in '+-':
-            data[(k, st)] = defaultdict(int)
-    # iteration
-    for l in args.sam:
+# read alignments from sam file
+def read_sam(fr):
+    for l in fr:
         # Skip header
         if l[0] == '@':
             continue
         # fetch informations
         ws = l.rstrip('\n').split('\t')
-        flag = int(ws[1])
-        chrom = ws[2]
-        loc = int(ws[3])-1
-        tlen = int(ws[8])
+        yield int(ws[1]), ws[2], int(ws[3])-1, int(ws[8])
+
+
+# read lines starting in the byte range [start, end) of a sam file
+def read_sam_chunk(fn, start, end):
+    with open(fn, 'rb') as fr:
+        # skip the line started before the chunk
+        if start:
+            fr.seek(start-1)
+            fr.readline()
+        while fr.tell() < end:
+            l = fr.readline()
+            if not l:
+                break
+            yield l.decode()
+
+
+# read alignments on selected chromosomes from indexed bam/cram file
+def read_bam(fn, chroms, reference=None):
+    import pysam
+    mode = 'rc' if fn.endswith('.cram') else 'rb'
+    with pysam.AlignmentFile(fn, mode, reference_filename=reference) as bam:
+        if bam.has_index():
+            regions = [bam.fetch(chrom) for chrom in chroms if chrom in bam.references]
+        else:
+            print(f'{fn} is not indexed, the whole file will be scanned', file=sys.stderr)
+            regions = [bam.fetch(until_eof=True)]
+        for region in regions:
+            for read in region:
+                if read.reference_name not in chroms:
+                    continue
+                yield read.flag, read.reference_name, read.reference_start, read.template_length
+
+
+# breakpoints as sorted unique locations and the summed coverage changes at them
+def breakpoints(locs, freqs):
+    keys, idx = np.unique(np.asarray(locs, dtype=np.int64), return_inverse=True)
+    values = np.zeros(len(keys), dtype=np.int64)
+    np.add.at(values, idx.ravel(), np.asarray(freqs, dtype=np.int64))
+    return keys, values
+
+
+# fragment breakpoints of each chromosome and strand
+def add_fragments(alignments, sizes, max_insert_size):
+    locs = {(k, st):[] for k in sizes for st in '+-'}
+    freqs = {(k, st):[] for k in sizes for st in '+-'}
+    for flag, chrom, loc, tlen in alignments:
         # skip second read
         if tlen <= 0:
             continue
         # filter on the read length
         tlen %= sizes[chrom]
-        if tlen > args.max_insert_size:
+        if tlen > max_insert_size:
             continue
-        # determine strand
-        # first read
-        if flag % 128 // 64:
-            if flag % 32 // 16:
-                st = '+'
-            else:
-                st = '-'
-        elif flag % 32 // 16:
-            st = '-'
-        else:
-            st = '+'
-        data[(chrom, st)][loc] += 1
-        data[(chrom, st)][loc+tlen] -= 1
+        st = get_strand(flag)
+        locs[(chrom, st)] += [loc, loc+tlen]
+        freqs[(chrom, st)] += [1, -1]
+    return {k:breakpoints(locs[k], freqs[k]) for k in locs}
 
-    # calc coverage
-    coverages = defaultdict(lambda: defaultdict(int))
+
+# worker: collect breakpoints of one input file or one chunk of it
+def count_fragments(task):
+    fn, start, end, sizes, max_insert_size, reference = task
+    if fn.endswith(('.bam', '.cram')):
+        data = add_fragments(read_bam(fn, sizes, reference), sizes, max_insert_size)
+    elif fn == '-':
+        data = add_fragments(read_sam(sys.stdin), sizes, max_insert_size)
+    elif end is None:
+        with open(fn) as fr:
+            data = add_fragments(read_sam(fr), sizes, max_insert_size)
+    else:
+        data = add_fragments(read_sam(read_sam_chunk(fn, start, end)), sizes, max_insert_size)
+    return fn, data
+
+
+# merge breakpoints from different workers
+def merge_breakpoints(parts):
+    return breakpoints(np.concatenate([x[0] for x in parts]), np.concatenate([x[1] for x in parts]))
+
+
+# split input files into tasks, large sam files are split by byte ranges
+def split_tasks(fns, chunks, sizes, max_insert_size, reference):
+    tasks = []
+    for fn in fns:
+        if chunks <= 1 or fn == '-' or fn.endswith(('.bam', '.cram')):
+            tasks.append((fn, 0, None, sizes, max_insert_size, reference))
+            continue
+        total = os.path.getsize(fn)
+        step = -(-total // chunks)
+        for start in range(0, total, step):
+            tasks.append((fn, start, min(start+step, total), sizes, max_insert_size, reference))
+    return tasks
+
+
+# build per-base coverage from breakpoints with a difference array
+# positions beyond chromosome end are folded back for circular genome
+def calc_coverage(bp, size):
+    locs, freqs = bp
+    if not len(locs):
+        return np.zeros(size, dtype=np.int64)
+    length = max(size, int(locs.max()) + 1)
+    length = -(-length // size) * size
+    diff = np.zeros(length, dtype=np.int64)
+    np.add.at(diff, locs, freqs)
+    return np.cumsum(diff).reshape(-1, size).sum(axis=0)
+
+
+# output coverage of each chromosome and strand
+def write_coverage(fo, data, sizes, compact=False, covered_only=False):
     for chrom, st in data.keys():
         size = sizes[chrom]
         curr = 0
         freq = 0
-        if args.compact:
-            for loc in sorted(data[(chrom, st)].keys()):
+        if compact:
+            for loc, change in zip(*(x.tolist() for x in data[(chrom, st)])):
                 if loc >= size :
                     continue
                 if freq:
-                    args.o.write(f'{chrom}\t{curr}\t{loc}\tTrue\t{freq}\t{st}\n')
-                elif not args.covered_only:
-                    args.o.write(f'{chrom}\t{curr}\t{loc}\tFalse\t{freq}\t{st}\n')
+                    fo.write(f'{chrom}\t{curr}\t{loc}\tTrue\t{freq}\t{st}\n')
+                elif not covered_only:
+                    fo.write(f'{chrom}\t{curr}\t{loc}\tFalse\t{freq}\t{st}\n')
                 curr = loc
-                freq += data[(chrom, st)][loc]
+                freq += change
         else:
-            for loc in sorted(data[(chrom, st)].keys()):
-                for i in range(curr, loc):
-                    coverages[(chrom, st)][i % size] += freq
-                curr = loc
-                freq += data[(chrom, st)][loc]
-            for i in range(size):
-                freq = coverages[(chrom, st)][i]
+            coverage = calc_coverage(data[(chrom, st)], size)
+            for i, freq in enumerate(coverage.tolist()):
                 if freq:
-                    args.o.write(f'{chrom}\t{i}\t{i+1}\tTrue\t{freq}\t{st}\n')
-                elif not args.covered_only:
-                    args.o.write(f'{chrom}\t{i}\t{i+1}\tFalse\t{freq}\t{st}\n')
+                    fo.write(f'{chrom}\t{i}\t{i+1}\tTrue\t{freq}\t{st}\n')
+                elif not covered_only:
+                    fo.write(f'{chrom}\t{i}\t{i+1}\tFalse\t{freq}\t{st}\n')
+
+
+# calculate coverage of all chromosomes and strands
+def get_coverages(data, sizes):
+    return {(chrom, st):calc_coverage(v, sizes[chrom]) for (chrom, st), v in data.items()}
+
+
+def main():
+    # argparse
+    parser = argparse.ArgumentParser(description='Calculate the DNA-seq coverage at each coordinate')
+    parser.add_argument('sam', nargs='+', help='Aligned filtered sam file(s), or indexed bam/cram file(s) (only chromosomes in fai are read)')
+    parser.add_argument('fai',type=argparse.FileType('r'), help='Corresponding fasta index file')
+    parser.add_argument('-o', default=sys.stdout, type=argparse.FileType('w'), help='Output to file, single input only')
+    parser.add_argument('-p', type=int, default=1, help='Number of worker processes (1)')
+    parser.add_argument('--out_dir', default=None, help='Output folder for multiple inputs, one {sample}.bed for each input')
+    parser.add_argument('--chunks', type=int, default=1, help='Split each sam file into N byte ranges processed in parallel (1)')
+    parser.add_argument('--covered_only', action='store_true', help='Only output covered items')
+    parser.add_argument('--compact', action='store_true', help='Output in compacted format, in this way, all chromsomes are treated as linear')
+    parser.add_argument('--binary', action='store_true', help='Output per-base coverage as binary track ({sample}.cov with --out_dir)')
+    parser.add_argument('--max_insert_size', default=1000, help='Maximum insert size allowed (1000nt)')
+    parser.add_argument('--reference', default=None, help='Reference fasta file for cram input')
+    args = parser.parse_args()
+
+    if len(args.sam) > 1 and args.out_dir is None:
+        parser.error('--out_dir is required for multiple inputs')
+    if args.binary and args.compact:
+        parser.error('--binary cannot be used with --compact')
+    if args.p > 1 and '-' in args.sam:
+        parser.error('stdin input cannot be used with -p > 1')
+    # output name of each input
+    names = {fn:os.path.basename(fn).rsplit('.', 1)[0] for fn in args.sam}
+    if args.out_dir is not None and len(set(names.values())) < len(args.sam):
+        parser.error('inputs must have different file names with --out_dir')
+
+    # get chrom sizes
+    sizes = read_fai(args.fai)
+
+    # Use the algorithom for "merge interval" question
+    # breakpoints of each chunk, for each input, chromosome and strand
+    parts = {fn:{(k, st):[] for k in sizes for st in '+-'} for fn in args.sam}
+    tasks = split_tasks(args.sam, args.chunks, sizes, args.max_insert_size, args.reference)
+    if args.p > 1 and len(tasks) > 1:
+        with Pool(args.p) as pool:
+            results = list(pool.imap_unordered(count_fragments, tasks))
+    else:
+        results = [count_fragments(task) for task in tasks]
+    for fn, d in results:
+        for k, bp in d.items():
+            parts[fn][k].append(bp)
+    data = {fn:{k:merge_breakpoints(v) for k, v in d.items()} for fn, d in parts.items()}
+
+    # calc coverage
+    if args.out_dir is None:
+        if args.binary:
+            write_track(args.o.buffer, get_coverages(data[args.sam[0]], sizes), sizes)
+        else:
+            write_coverage(args.o, data[args.sam[0]], sizes, args.compact, args.covered_only)
+    else:
+        os.makedirs(args.out_dir, exist_ok=True)
+        for fn, d in data.items():
+            name = names[fn]
+            if args.binary:
+                with open(f'{args.out_dir}/{name}.cov', 'wb') as fw:
+                    write_track(fw, get_coverages(d, sizes), sizes)
+            else:
+                with open(f'{args.out_dir}/{name}.bed', 'w') as fo:
+                    write_coverage(fo, d, sizes, args.compact, args.covered_only)
 
-    print('Done!')
+    # keep binary track on stdout clean
+    if args.binary and args.out_dir is None and args.o is sys.stdout:
+        print('Done!', file=sys.stderr)
+    else:
+        print('Done!')
 
 if __name__ == '__main__':
     main()
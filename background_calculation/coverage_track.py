@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import json
+import os
+
+# Binary coverage track
+# 8-byte magic, uint32 header length, json header padded to 8 bytes,
+# then one uint32 array for each chromosome and strand ('+' before '-')
+magic = b'RNMPCOV1'
+strands = '+-'
+
+
+# write per-base coverage of each chromosome and strand
+def write_track(fw, coverages, sizes):
+    chroms = [[k, v] for k, v in sizes.items()]
+    header = json.dumps({'chroms':chroms, 'strands':strands}).encode()
+    header += b' ' * (-(len(magic) + 4 + len(header)) % 8)
+    fw.write(magic)
+    fw.write(np.array(len(header), dtype='<u4').tobytes())
+    fw.write(header)
+    for chrom, size in chroms:
+        for st in strands:
+            cov = coverages.get((chrom, st), np.zeros(size))
+            fw.write(np.asarray(cov, dtype='<u4').tobytes())
+
+
+# read header of binary coverage track from the start of a binary stream
+def read_header(fb):
+    if fb.read(len(magic)) != magic:
+        raise ValueError(f'{fb.name} is not a binary coverage track')
+    length = int(np.frombuffer(fb.read(4), dtype='<u4')[0])
+    header = json.loads(fb.read(length))
+    return header, len(magic) + 4 + length
+
+
+# load coverage of an opened track as {(chrom, strand): uint32 array}
+# regular files are memory mapped, other streams (stdin, pipes) are read into memory
+def read_track(fr):
+    fb = getattr(fr, 'buffer', fr)
+    header, offset = read_header(fb)
+    total = sum(size for _, size in header['chroms']) * len(header['strands'])
+    if isinstance(fr.name, str) and os.path.isfile(fr.name):
+        data = np.memmap(fr.name, dtype='<u4', mode='r', offset=offset, shape=(total,))
+    else:
+        data = np.frombuffer(fb.read(total * 4), dtype='<u4')
+        if len(data) != total:
+            raise ValueError(f'{fr.name} is truncated')
+    coverages = {}
+    curr = 0
+    for chrom, size in header['chroms']:
+        for st in header['strands']:
+            coverages[(chrom, st)] = data[curr:curr+size]
+            curr += size
+    return coverages
+
+
+# check whether an opened file is a binary coverage track without consuming it
+def is_track(fr):
+    return getattr(fr, 'buffer', fr).peek(len(magic))[:len(magic)] == magic
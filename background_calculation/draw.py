@@ -8,6 +8,10 @@ import matplotlib as mpl
 import matplotlib.pyplot as plt
 import seaborn as sns
 import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from circular_plot import polar_axes, draw_ticks
+from coverage_track import is_track, read_track
 
 
 # get mitochondrial DNA size
@@ -30,20 +34,32 @@ def calc_coverage(frs, bin, size, mt_name):
         for st in '+-':
             freqs[st][name] = [0 for i in range(size//bin+1)]
             total[st] = 0
-        for l in fr:
-            ws = l.rstrip('\n').split('\t')
-            if len(ws) < 6:
-                continue
-            if ws[0] != mt_name:
-                continue
-            s = int(ws[1])
-            e = int(ws[2])
-            freq = float(ws[4])
-            st = ws[5]
-            if freq == 0:
-                continue
-            freqs[st][name][s//bin] += freq
-            total[st] += freq
+        # binary coverage track
+        if is_track(fr):
+            track = read_track(fr)
+            for st in '+-':
+                if (mt_name, st) not in track:
+                    continue
+                cov = track[(mt_name, st)]
+                freqs[st][name] = np.bincount(
+                    np.arange(len(cov))//bin, weights=cov, minlength=size//bin+1
+                ).tolist()
+                total[st] = float(cov.sum(dtype=np.int64))
+        else:
+            for l in fr:
+                ws = l.rstrip('\n').split('\t')
+                if len(ws) < 6:
+                    continue
+                if ws[0] != mt_name:
+                    continue
+                s = int(ws[1])
+                e = int(ws[2])
+                freq = float(ws[4])
+                st = ws[5]
+                if freq == 0:
+                    continue
+                freqs[st][name][s//bin] += freq
+                total[st] += freq
         for st in '+-':
             freqs[st][name] = np.asarray(freqs[st][name])
             if total[st] != 0:
@@ -68,17 +84,14 @@ def draw(
         df, size, bin, out, tick_interval=2000,
         scale_pos=np.pi, draw_legend=False
     ):
-    sns.set(style='ticks', font_scale=3)
+    if draw_legend:
+        layout = {'figsize':(15,10), 'adjust':{'left':0, 'right':0.7}}
+    else:
+        margin = 0.07
+        layout = {'figsize':(10,10), 'adjust':{'left':margin, 'right':1-margin, 'top':1-margin, 'bottom':margin}}
     for st in ['Light', 'Heavy']:
         data = df[df.Strand == st].copy()
-        if draw_legend:
-            fig, _ = plt.subplots(figsize=(15,10), dpi=300)
-            plt.subplots_adjust(left=0, right=0.7)
-        else:
-            fig, _ = plt.subplots(figsize=(10,10), dpi=300)
-            margin = 0.07
-            plt.subplots_adjust(left=margin, right=1-margin, top=1-margin, bottom=margin)
-        ax = plt.subplot(111, polar=True)
+        fig, ax = polar_axes(size, tick_interval, dpi=300, font_scale=3, **layout)
         # calc width and angles
         width = np.pi * 2 / (size//bin + 1)
         angles = [x*width for x in range(size//bin + 1)] + [0]
@@ -88,10 +101,6 @@ def draw(
             x='Angles', y='Frequency', hue='Sample', 
             data=data, ax=ax, linewidth=2
         )
-        # theta ticks
-        ax.xaxis.set_tick_params(size=2, width=2)
-        ax.set_xticks([x*tick_interval*2*np.pi/size for x in range(size//tick_interval+1)])
-        ax.set_xticklabels([int(x*tick_interval/1000) for x in range(size//tick_interval+1)])
         # limits
         ax.set_ylim([0, 2.3])
         ax.set_rorigin(-6)
@@ -100,22 +109,13 @@ def draw(
         ax.plot(np.linspace(0, 2*np.pi, nspikes), [0]*nspikes, 'k', linewidth=2)
         ax.plot(np.linspace(0, 2*np.pi, nspikes), [1]*nspikes, 'k--', linewidth=1)
         # plot ticks
-        ax.plot([0]*5, np.linspace(0, 2, 5), 'k', linewidth=2)
-        for x in range(1, size//tick_interval+1):
-            loc = x * tick_interval * np.pi * 2 / size
-            ax.plot((loc, loc), (0, 2), color='k', linewidth=1)
-        # plot position
-        ax.set_theta_zero_location('N')
-        ax.set_theta_direction(-1)
-        plt.setp(ax.spines.values(), linewidth=0)
+        draw_ticks(ax, size, tick_interval, 2)
         # legend
         if draw_legend:
             plt.legend(loc=(1.1,0.1))
         else:
             ax.get_legend().remove()
         # other settings
-        ax.grid(False)
-        ax.yaxis.set_visible(False)
         ax.set_xlabel('')
         ax.set_ylabel('')
         fig.savefig(f'{out}_{st}.png', transparent=True)
@@ -126,7 +126,7 @@ def draw(
 def main():
     # argparse
     parser = argparse.ArgumentParser(description='Draw background coverage for DNA seq')
-    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='Coverage bed file')
+    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='Coverage bed file or binary coverage track')
     parser.add_argument('fai', type=argparse.FileType('r'), help='Fasta index file')
     parser.add_argument('-o', default='coverage', help='Output base name, (coverage)')
     parser.add_argument('-b', type=int, default=200, help='Bin size, default=200nt')
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pandas as pd
+import argparse
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from rnmp_library import load_libraries
+from region_profile import read_regions, region_positions, strand_counts, region_profiles
+
+
+# read total reads
+def read_total(fr):
+    total = {}
+    for l in fr:
+        ws = l.rstrip().split('\t')
+        if len(ws) == 2:
+            total[ws[0]] = int(ws[1])
+    return total
+
+
+# output the profile matrix of a region, one row for each library and strand
+def write_profile(fn, names, positions, profile):
+    df = pd.DataFrame(profile, columns=positions)
+    df.insert(0, 'Strand', np.tile(['Light', 'Heavy'], len(names)))
+    df.insert(0, 'Library', np.repeat(names, 2))
+    df.to_csv(fn, sep='\t', index=False)
+
+
+def main():
+    # argparse
+    parser = argparse.ArgumentParser(description='Calculate moving average of PPB on light and heavy strands in regions of interest. ' + \
+        'A matrix of libraries and strands by positions is generated for each region ({o}/{region}.tsv)')
+    parser.add_argument('total', type=argparse.FileType('r'), help='Tsv file of total rNMP counts for each libraries')
+    parser.add_argument('regions', type=argparse.FileType('r'), help='Bed file of regions (chrom, start, end, name, score, strand). ' + \
+        'Lines of the same name are joined, start > end wraps the origin, regions on - strand are reversed')
+    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='rNMP incorporation bed files or library stores')
+    parser.add_argument('-f', type=int, default=25, help='Flank length at both direction, default = 25 nt')
+    parser.add_argument('-o', default='region_profiles', help='Output folder, (region_profiles)')
+    parser.add_argument('--mt_name', default='chrM', help='Mitochondria name, default=chrM')
+    parser.add_argument('--mt_size', type=int, default=16569, help='mtDNA size (16569)')
+    parser.add_argument('--freq_col', type=int, default=0, help='Read rNMP frequency from which column? (one rNMP per line by default)')
+    parser.add_argument('--no_cache', '--no-cache', action='store_true', help='Do not use cached libraries')
+    args = parser.parse_args()
+
+    # total reads
+    total = read_total(args.total)
+
+    # regions
+    regions = read_regions(args.regions, args.mt_name)
+    assert regions, f'Cannot find regions on {args.mt_name} in {args.regions.name}!'
+
+    # load libraries and calculate profiles of all regions at once
+    libs = load_libraries(args.bed, args.mt_name, not args.no_cache, args.freq_col)
+    names = [x for x in libs if x in total]
+    assert names, 'None of the libraries are found in the total rNMP counts!'
+    counts = strand_counts([libs[x] for x in names], args.mt_size)
+    # heavy strands are smoothed in their own direction, the same as replication_distribution.py
+    profiles = region_profiles(counts, np.repeat([total[x] for x in names], 2), regions, args.f, np.tile([False, True], len(names)))
+
+    # output
+    os.makedirs(args.o, exist_ok=True)
+    for name, (st, intervals) in regions.items():
+        positions = region_positions(intervals, args.mt_size)
+        if st == '-':
+            positions = positions[::-1]
+        write_profile(f'{args.o}/{name}.tsv', names, positions, profiles[name])
+
+    print('Done!')
+
+
+if __name__ == '__main__':
+    main()
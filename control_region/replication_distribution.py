@@ -1,13 +1,15 @@
 #!/usr/bin/env python3
 
 from collections import defaultdict
-import numpy as np
-import pandas as pd
 import argparse
 import matplotlib.pyplot as plt
 import seaborn as sns
 import sys
 import matplotlib.ticker as ticker
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from rnmp_library import load_libraries
+from region_profile import replication_profile
 from curlyBrace import curlyBrace
 
 # replication origin coordinate
@@ -40,60 +42,11 @@ def read_celltypes(fr):
 
 
 # load rNMPs in bed file and calculate moving avg
-def load_bed(same, oppo, total, flank):
+def load_bed(same, oppo, total, flank, cache=True, fid=0):
     global cr1_s, cr1_e, cr2_s, cr2_e, oh_s, oh_e
-    df = []
-    beds = [[fr, 'Light'] for fr in same]
-    beds += [[fr, 'Heavy'] for fr in oppo]
-    for bed, st in beds:
-        # Filter out libraries
-        name = bed.name.split('/')[-1].split('.')[0]
-        if name not in total:
-            continue
-        # initialization    
-        data = np.zeros(cr1_e-cr1_s + cr2_e-cr2_s)
-        for l in bed:
-            ws = l.rstrip().split('\t')
-            if len(ws) < 6:
-                continue
-            s = int(ws[1])
-            e = int(ws[2])
-            if ws[0] == 'chrM':
-                if st == 'Light' and ws[5] == '+':
-                    if cr1_s <= s < cr1_e:
-                        data[s-cr1_s] += 1
-                    elif cr2_s <= s <cr2_e:
-                        data[s+cr1_e-cr1_s] += 1
-                elif st == 'Heavy' and ws[5] == '-':
-                    if cr1_s <= s < cr1_e:
-                        data[cr1_s - e] += 1
-                    elif cr2_s <= s < cr2_e:
-                        data[cr2_e - e] += 1
-        data /= total[name]
-        data /= data.shape[0]
-        data = np.convolve(data, np.ones(flank*2+1)/(flank*2+1), mode='same')
-        for i in range(data.shape[0]):
-            if st == 'Heavy':
-                d = [name, st, len(data)-1-i, data[i]]
-            else:
-                d = [name, st, i, data[i]]
-            if st == 'Light':
-                if i < cr1_e - cr1_s + oh_s:
-                    d.append('Upstream')
-                elif i < cr1_e - cr1_s + oh_e:
-                    d.append('OriH')
-                else:
-                    d.append('Downstream')
-            else:
-                if i < cr2_e - oh_e:
-                    d.append('Upstream')
-                elif cr2_e - oh_e <= i < cr2_e - oh_s:
-                    d.append('OriH')
-                else:
-                    d.append('Downstream')
-            df.append(d)
-    df = pd.DataFrame(df, columns=['Library', 'Strand', 'Position', 'Moving_avg', 'Region'])
-    return df
+    beds = [[name, lib, 'Light'] for name, lib in load_libraries(same, cache=cache, fid=fid).items()]
+    beds += [[name, lib, 'Heavy'] for name, lib in load_libraries(oppo, cache=cache, fid=fid).items()]
+    return replication_profile(beds, total, flank, (cr1_s, cr1_e), (cr2_s, cr2_e), (oh_s, oh_e))
 
 
 # draw histogram
@@ -162,10 +115,12 @@ def main():
     parser = argparse.ArgumentParser(description='Calculate the distribution of rNMPs in human mt replication origin region (MT-CR)')
     parser.add_argument('total',type=argparse.FileType('r'), help='Tsv file of total rNMP counts for each libraries')
     parser.add_argument('celltypes', type=argparse.FileType('r'), help='List of cell types')
-    parser.add_argument('--same', type=argparse.FileType('r'), nargs='+', help='Bed files on the same strand of MT-CR')
-    parser.add_argument('--oppo', type=argparse.FileType('r'), nargs='+', help='Bed files on the opposite strand of MT-CR')
+    parser.add_argument('--same', type=argparse.FileType('r'), nargs='+', help='Bed files (or a library store) on the same strand of MT-CR')
+    parser.add_argument('--oppo', type=argparse.FileType('r'), nargs='+', help='Bed files (or a library store) on the opposite strand of MT-CR')
     parser.add_argument('-f', type=int, default=25, help='Flank length at both direction, default = 25 nt')
     parser.add_argument('-o', default='mt_cr', help='Output basename')
+    parser.add_argument('--freq_col', type=int, default=0, help='Read rNMP frequency from which column? (one rNMP per line by default)')
+    parser.add_argument('--no_cache', '--no-cache', action='store_true', help='Do not use cached libraries')
     args = parser.parse_args()
 
     assert len(args.same) == len(args.oppo) and len(args.same) >=1, 'There should be at least one pair of same/oppo bed files'
@@ -177,7 +132,7 @@ def main():
     celltypes = read_celltypes(args.celltypes)
 
     # load data
-    ppb = load_bed(args.same, args.oppo, total, args.f)
+    ppb = load_bed(args.same, args.oppo, total, args.f, not args.no_cache, args.freq_col)
 
     # add annotations
     ppb['Celltype'] = ppb['Library'].map(celltypes)
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 from collections import defaultdict
+from multiprocessing import Pool
 import pandas as pd
 import numpy as np
 import argparse
@@ -8,6 +9,10 @@ import matplotlib as mpl
 import matplotlib.pyplot as plt
 import seaborn as sns
 import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from circular_plot import polar_axes, draw_ticks
+from rnmp_library import read_libinfo, load_libraries, weights
 
 
 # get mitochondrial DNA size
@@ -21,90 +26,246 @@ def get_mt_size(fai, name):
     return None
 
 
-# load rNMP coordinates
-def load_bed(bed, size, info, bin, name, selected):
-    data = {}
-    counts = {}
-    for fr in bed:
-        fs = fr.name.split('/')[-1].split('.')[0]
+# scale of each bin, only last bin have a different bin size
+def bin_scale(size, bin):
+    scale = np.full(size//bin+1, 1/(bin/size))
+    if size % bin:
+        scale[-1] = 1/((size % bin)/size)
+    return scale
+
+
+# long-form EF table from a (library x strand x bin) EF array
+def ef_frame(samples, efs, info, size, bin):
+    n_st, n_bin = efs.shape[1:]
+    starts = np.arange(n_bin) * bin
+    df = pd.DataFrame({
+        'Sample':np.repeat(samples, n_st*n_bin),
+        'Celltype':np.repeat([info[fs] for fs in samples], n_st*n_bin),
+        'Strand':np.tile(np.repeat(['+', '-'], n_bin), len(samples)),
+        'Start':np.tile(starts, len(samples)*n_st),
+        'End':np.tile(np.minimum(starts+bin, size), len(samples)*n_st),
+        'EF':efs.ravel()
+    })
+    return df
+
+
+# libraries with information in selected cell types
+# cell types saved in library stores are added to info
+def select_libraries(bed, info, name, selected, cache=True, fid=0):
+    libs, stored = load_libraries(bed, name, cache, fid, with_info=True)
+    info.update({fs:celltype for fs, (celltype, _) in stored.items()})
+    for fs, lib in libs.items():
         if fs not in info:
             print(f'Library {fs} doesn\'t have related information, skipped')
             continue
-        counts[fs] = {'+':0, '-':0}
         geno = info[fs]
         if selected and geno not in selected:
             continue
-        if fs not in data:
-            data[fs] = {'+':[0]*(size//bin+1), '-':[0]*(size//bin+1)}
-        for l in fr:
-            ws = l.rstrip('\n').split('\t')
-            if len(ws) < 6:
-                continue
-            if ws[0] != name:
-                continue
-            loc = int(ws[1])
-            st = ws[5]
-            counts[fs][st] += 1
-            # only last bin have a different bin size
-            if loc // bin == size // bin:
-                b = size % bin
-            else:
-                b = bin
-            data[fs][st][loc//bin] += 1/ (b/size)
-    df = []
-    for fs, v in data.items():
-        for st, efs in v.items():
-            for i, ef in enumerate(efs):
-                df.append([fs, info[fs], st, i*bin, min(i*bin+bin, size), ef/counts[fs][st]])
-    df = pd.DataFrame(df, columns=['Sample', 'Celltype', 'Strand', 'Start','End','EF'])
-    return df
+        yield fs, lib
+
+
+# prefix sums of single-nucleotide rNMP counts, (library x strand x size+1)
+def load_prefix(bed, size, info, name, selected, cache=True, fid=0):
+    samples = []
+    prefix = []
+    for fs, lib in select_libraries(bed, info, name, selected, cache, fid):
+        samples.append(fs)
+        counts = [
+            np.bincount(lib['loc'][lib['plus'] == plus], weights=weights(lib)[lib['plus'] == plus], minlength=size)[:size]
+            for plus in [True, False]
+        ]
+        prefix.append(np.cumsum(np.pad(counts, ((0, 0), (1, 0))), axis=1))
+    # counts are integers unless rNMP frequencies are read
+    prefix = np.array(prefix, dtype=float if fid else np.int64).reshape(len(samples), 2, size+1)
+    return samples, prefix
+
+
+# EF of binned rNMP counts, (... x strand x bin) counts over (... x strand) totals
+# with whole rNMPs, the bin scale is summed once for each rNMP in the bin, the same rounding as counting rNMPs one by one
+def bin_ef(counts, totals, scale):
+    if counts.dtype.kind == 'i':
+        sums = np.zeros(counts.shape)
+        for x in np.unique(scale):
+            cols = scale == x
+            # running sums of the scale, indexed by rNMP count
+            table = np.concatenate([[0], np.cumsum(np.full(counts[..., cols].max(initial=0), x))])
+            sums[..., cols] = table[counts[..., cols]]
+    else:
+        sums = counts * scale
+    return sums / totals[..., None]
+
 
+# EF of each bin derived from prefix sums
+def sweep_ef(samples, prefix, info, size, bin):
+    scale = bin_scale(size, bin)
+    edges = np.minimum(np.arange(len(scale)+1) * bin, size)
+    counts = prefix[:, :, edges[1:]] - prefix[:, :, edges[:-1]]
+    efs = bin_ef(counts, prefix[:, :, -1], scale)
+    return ef_frame(samples, efs, info, size, bin)
 
-# read order
-def read_libinfo(fr, c):
-    data = {}
-    for l in fr:
-        ws = l.rstrip().split('\t')
-        name = ws.pop(c)
-        data[name] = '_'.join(ws)
-    return data
+
+# mean over libraries with compensated summation, same as pandas groupby mean
+def masked_mean(efs, mask):
+    total = np.zeros(efs.shape[1:])
+    comp = np.zeros(efs.shape[1:])
+    for ef, m in zip(efs, mask):
+        y = np.where(m, ef - comp, 0)
+        t = total + y
+        comp = np.where(m, t - total - y, comp)
+        total = t
+    return total / mask.sum(axis=0)
 
 
 # get rNMP enriched zones
 def get_rez(ef, threshold, sample_threshold):
     rezs = ef[ef.EF > threshold].copy()
+    # EF tensor, (library x strand x bin)
+    samples = ef.Sample.unique()
+    n_sample = len(samples)
+    strands = np.array(['+', '-'])
+    n_bin = len(ef) // max(n_sample * len(strands), 1)
+    efs = ef.EF.to_numpy().reshape(n_sample, len(strands), n_bin)
+    starts = ef.Start.to_numpy()[:n_bin]
+    ends = ef.End.to_numpy()[:n_bin]
+    # first row of each library
+    first = np.arange(n_sample) * len(strands) * n_bin
+    mask = efs > threshold
     # common enriched zones
-    n_sample = len(ef.Sample.unique())
-    n_celltype = len(ef.Celltype.unique())
-    common = rezs.groupby(by=['Strand', 'Start', 'End']).agg(
-        {
-            'Sample':['nunique','unique'],
-            'Celltype':'nunique',
-            'EF':['mean','median']
-        }
-    ).reset_index()
-    common.columns = ['Strand', 'Start', 'End', 'Sample_count', 'Sample', 'Celltype_count', 'EF_mean', 'EF_median']
-    common = common[(common.Celltype_count == n_celltype) & (common.Sample_count > n_sample * sample_threshold)].copy()
-    common = common.sort_values(by=['Strand', 'Start'])
-    names = []
-    curr = {'+':1, '-':1}
-    for _, x in common.iterrows():
-        st = x.Strand
-        if st == '+':
-            names.append(f'REZ{curr[st]}L')
-        else:
-            names.append(f'REZ{curr[st]}H')
-        curr[st] += 1
-    common['Name'] = names
-    common = common[['Name', 'Strand', 'Start', 'End', 'Sample_count', 'EF_mean', 'EF_median', 'Sample']]
+    celltypes, uniques = pd.factorize(ef.Celltype.to_numpy()[first])
+    n_celltype = len(uniques)
+    sample_count = mask.sum(axis=0)
+    celltype_count = np.zeros(sample_count.shape, dtype=int)
+    for c in range(n_celltype):
+        celltype_count += mask[celltypes == c].any(axis=0)
+    selected = (celltype_count == n_celltype) & (sample_count > n_sample * sample_threshold)
+    st_idx, bin_idx = np.nonzero(selected)
+    medians = np.nanmedian(np.where(mask, efs, np.nan)[:, st_idx, bin_idx], axis=0)
+    names = ef.Sample.iloc[first].reset_index(drop=True)
+    # name zones in each strand by order
+    order = np.ones(len(st_idx), dtype=int)
+    for i in range(len(strands)):
+        order[st_idx == i] = np.arange(1, (st_idx == i).sum() + 1)
+    common = pd.DataFrame({
+        'Name':np.char.add(np.char.add('REZ', order.astype(str)), np.where(st_idx == 0, 'L', 'H')),
+        'Strand':strands[st_idx],
+        'Start':starts[bin_idx],
+        'End':ends[bin_idx],
+        'Sample_count':sample_count[st_idx, bin_idx],
+        'EF_mean':masked_mean(efs[:, st_idx, bin_idx], mask[:, st_idx, bin_idx]),
+        'EF_median':medians,
+        'Sample':[names[mask[:, i, j]].unique() for i, j in zip(st_idx, bin_idx)]
+    })
     return rezs, common
 
 
+# count permutations meeting the common REZ criteria: at least the observed sample count and enriched in all cell types
+# celltypes: cell type code of each library
+def permute_batch(task):
+    seed, batch, totals, celltypes, size, bin, threshold, st_idx, bin_idx, observed = task
+    rng = np.random.default_rng(seed)
+    scale = bin_scale(size, bin)
+    lengths = np.diff(np.minimum(np.arange(len(scale)+1) * bin, size))
+    # relocate rNMPs of each library and strand uniformly along chrM, frequencies are rounded to whole rNMPs
+    totals = np.rint(totals).astype(np.int64)
+    counts = rng.multinomial(totals, lengths / size, size=(batch,) + totals.shape)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        efs = bin_ef(counts, totals, scale)
+    # (permutation x library x common REZ)
+    mask = (efs > threshold)[:, :, st_idx, bin_idx]
+    n_celltype = celltypes.max(initial=-1) + 1
+    celltype_count = sum(mask[:, celltypes == c].any(axis=1) for c in range(n_celltype))
+    null = (mask.sum(axis=1) >= observed) & (celltype_count == n_celltype)
+    return null.sum(axis=0)
+
+
+# Benjamini-Hochberg adjusted p-values
+def bh_fdr(pvalues):
+    n = len(pvalues)
+    order = np.argsort(pvalues)
+    adjusted = pvalues[order] * n / np.arange(1, n+1)
+    adjusted = np.minimum.accumulate(adjusted[::-1])[::-1].clip(max=1)
+    fdr = np.empty(n)
+    fdr[order] = adjusted
+    return fdr
+
+
+# empirical p-values of common REZs from permutations
+def permutation_test(common, totals, celltypes, size, bin, threshold, n_perm, processes=1, batch=100, seed=None):
+    st_idx = np.where(common.Strand.to_numpy() == '+', 0, 1)
+    bin_idx = common.Start.to_numpy() // bin
+    observed = common.Sample_count.to_numpy()
+    batches = [min(batch, n_perm - i) for i in range(0, n_perm, batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(batches))
+    tasks = [(sd, b, totals, celltypes, size, bin, threshold, st_idx, bin_idx, observed) for sd, b in zip(seeds, batches)]
+    if processes > 1:
+        with Pool(processes) as pool:
+            exceed = sum(pool.map(permute_batch, tasks))
+    else:
+        exceed = sum(map(permute_batch, tasks))
+    common = common.copy()
+    common['P_value'] = (exceed + 1) / (n_perm + 1)
+    common['FDR'] = bh_fdr(common.P_value.to_numpy())
+    return common
+
+
+# draw circular plot for REZ of one strand
+def draw_strand(task):
+    (
+        cells, celltypes, colors, common, size, bin, out, st,
+        tick_interval, draw_legend, no_annot, show_loc
+    ) = task
+    if draw_legend:
+        adjust = {'left':0, 'right':0.7}
+        fig, ax = polar_axes(size, tick_interval, figsize=(15,10), dpi=300, font_scale=5, adjust=adjust)
+    else:
+        margin = 0.07
+        adjust = {'left':margin, 'right':1-margin, 'top':1-margin, 'bottom':margin}
+        fig, ax = polar_axes(size, tick_interval, figsize=(10,10), dpi=300, font_scale=5, adjust=adjust)
+    # calc width and angles
+    width = np.pi * 2 / (size//bin + 1)
+    # whole sample x bin matrix as a single mesh, bins are split to follow the arc
+    i = cells.shape[0]
+    split = int(np.ceil(width / (np.pi / 180)))
+    thetas = np.linspace(0, 2*np.pi, cells.shape[1]*split + 1)
+    mesh = np.ma.masked_less(np.repeat(cells, split, axis=1), 0)
+    cmap = mpl.colors.ListedColormap([colors[x] for x in celltypes])
+    ax.pcolormesh(
+        thetas, np.arange(i+1), mesh, cmap=cmap,
+        vmin=-0.5, vmax=len(celltypes)-0.5, shading='flat'
+    )
+    # annotation
+    if not no_annot:
+        common_st = common[common.Strand == st]
+        locs = common_st.Start.to_numpy() // bin * width + width / 2
+        for loc in locs:
+            r_marker = loc * 360 / (2 * np.pi)
+            ax.scatter(
+                [loc], [i+4], 
+                marker=(3, 0, -r_marker+180), color='k', s=500
+            )
+    # limits
+    plt.ylim((-0.5*i, 1.25*i))
+    ax.set_rorigin(-0.5*i)
+    # plot a line for zero and other small ticks
+    draw_ticks(ax, size, tick_interval, i*1.1)
+    # legend
+    if draw_legend:
+        present = [celltypes[x] for x in pd.unique(cells.max(axis=1)) if x >= 0]
+        handles = [mpl.patches.Patch(color=colors[x], label=x) for x in present]
+        plt.legend(handles=handles, loc=(1.1,0.1))
+    # other settings
+    if not show_loc:
+        ax.xaxis.set_visible(False)
+    st_name = 'light' if st == '+' else 'heavy'
+    fig.savefig(f'{out}_REZ_{st_name}.png')
+    plt.close('all')
+
+
 # draw circular plot for REZ
 def draw(
         data, common, size, bin, out, order, palette, 
         tick_interval=2000, scale_pos=np.pi, draw_legend=False, no_annot=False,
-        show_loc=False
+        show_loc=False, processes=1
     ):
     # sort and assign colors
     for c in data.Celltype.unique():
@@ -115,88 +276,38 @@ def draw(
     orderd = {order[i]:i for i in range(len(order))}
     data['order'] = data.Celltype.map(orderd)
     data = data.sort_values(by=['order','Sample'])
-    # initialize figures
+    # sample x bin matrix of cell type index, -1 for bins without REZ
+    samples = {x:i for i, x in enumerate(data.Sample.unique())}
+    tasks = []
     for st in ['+', '-']:
-        sns.set(style='ticks', font_scale=5)
-        if draw_legend:
-            fig, _ = plt.subplots(figsize=(15,10), dpi=300)
-            plt.subplots_adjust(left=0, right=0.7)
-        else:
-            fig, _ = plt.subplots(figsize=(10,10), dpi=300)
-            margin = 0.07
-            plt.subplots_adjust(left=margin, right=1-margin, top=1-margin, bottom=margin)
-        ax = plt.subplot(111, polar=True)
-        # calc width and angles
-        width = np.pi * 2 / (size//bin + 1)
-        angles = [x*width for x in range(size//bin + 1)] + [0]
-        # each genotype
-        i = 0
-        grouped = set()
-        for fs in data.Sample.unique():
-            # prepare data for bar plot
-            d = data[(data.Sample==fs) & (data.Strand==st)]
-            geno = d.Celltype.unique()[0]
-            height = [0] * len(angles)
-            bottom = [i] * len(angles)
-            for _, x in d.iterrows():
-                height[x.Start//bin] += 1
-            # plot forward
-            if geno not in grouped:
-                bars = ax.bar(angles, height, width=width, bottom=bottom, align='edge', color=colors[geno], linewidth=0.1, label=geno)
-                grouped.add(geno)
-            else:
-                bars = ax.bar(angles, height, width=width, bottom=bottom, align='edge', linewidth=0.1, color=colors[geno])
-            i += 1
-        # annotation
-        if not no_annot:
-            common_st = common[common.Strand == st]
-            for _, x in common_st.iterrows():
-                loc = angles[x.Start//bin] + width / 2
-                r_marker = loc * 360 / (2 * np.pi)
-                ax.scatter(
-                    [loc], [i+4], 
-                    marker=(3, 0, -r_marker+180), color='k', s=500
-                )
-        # theta ticks
-        ax.xaxis.set_tick_params(size=2, width=2)
-        ax.set_xticks([x*tick_interval*2*np.pi/size for x in range(size//tick_interval+1)])
-        ax.set_xticklabels([int(x*tick_interval/1000) for x in range(size//tick_interval+1)])
-        # limits
-        plt.ylim((-0.5*i, 1.25*i))
-        ax.set_rorigin(-0.5*i)
-        # plot a line for zero
-        ax.plot([0]*50, np.linspace(0, i*1.1, 50), 'k', linewidth=2)
-        # plot other small ticks
-        for x in range(1, size//tick_interval+1):
-            loc = x * tick_interval * np.pi * 2 / size
-            ax.plot((loc, loc), (0, i*1.1), color='k', linewidth=1)
-        # plot position
-        ax.set_theta_zero_location('N')
-        ax.set_theta_direction(-1)
-        plt.setp(ax.spines.values(), linewidth=0)
-        # legend
-        if draw_legend:
-            plt.legend(loc=(1.1,0.1))
-        # other settings
-        ax.grid(False)
-        ax.yaxis.set_visible(False)
-        if not show_loc:
-            ax.xaxis.set_visible(False)
-        st_name = 'light' if st == '+' else 'heavy'
-        fig.savefig(f'{out}_REZ_{st_name}.png')
-        plt.close('all')
+        d = data[data.Strand == st]
+        cells = np.full((len(samples), size//bin + 1), -1)
+        cells[d.Sample.map(samples).to_numpy(), d.Start.to_numpy()//bin] = d.order.to_numpy()
+        tasks.append((
+            cells, order, colors, common, size, bin, out, st,
+            tick_interval, draw_legend, no_annot, show_loc
+        ))
+    # light and heavy figures
+    if processes > 1:
+        with Pool(min(processes, len(tasks))) as pool:
+            pool.map(draw_strand, tasks)
+    else:
+        for task in tasks:
+            draw_strand(task)
 
 
 
 def main():
     # argparse
     parser = argparse.ArgumentParser(description='Analyze enriched zones for human mtDNA')
-    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='rNMP incorporation bed files')
+    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='rNMP incorporation bed files or library stores')
     parser.add_argument('fai', type=argparse.FileType('r'), help='Fasta index file')
     parser.add_argument('libinfo', type=argparse.FileType('r'), help='Library information')
     parser.add_argument('-o', default='enriched_zone', help='Output base name, (enriched_zones)')
     parser.add_argument('-c', type=int, default=2, help='Col num for FS number, default=2')
     parser.add_argument('-b', type=int, default=200, help='Bin size, default=200nt')
+    parser.add_argument('-f', type=int, default=0, help='Read rNMP frequency from which column? (one rNMP per line by default)')
+    parser.add_argument('--sweep', type=int, default=None, nargs='+', help='Bin sizes to scan, output REZ tables for each bin size without figures')
     parser.add_argument('-t', type=int, default=2000, help='Tick interval, default=2,000nt')
     parser.add_argument('--ef_threshold', type=float, default=1, help='Enrichment factor threshold for enriched regions, default=1')
     parser.add_argument('--sample_threshold', type=float, default=0.8, help='The minimum library ratio threshold of common enriched regions, default=0.8')
@@ -207,6 +318,10 @@ def main():
     parser.add_argument('--legend', action='store_true', help='Draw legend')
     parser.add_argument('--no_annot', action='store_true', help='Do not annotate common REZs')
     parser.add_argument('--show_loc', action='store_true', help='Draw location indicators')
+    parser.add_argument('--permutations', type=int, default=0, help='Number of permutations for REZ significance, a permutation exceeds a common REZ if as many libraries in all cell types are enriched, default=0 (no test)')
+    parser.add_argument('--seed', type=int, default=None, help='Random seed for permutations')
+    parser.add_argument('-p', type=int, default=1, help='Number of worker processes for permutations and figures, default=1')
+    parser.add_argument('--no_cache', '--no-cache', action='store_true', help='Do not use cached libraries')
     args = parser.parse_args()
     args.c -= 1
 
@@ -216,19 +331,32 @@ def main():
     # load information
     info = read_libinfo(args.libinfo, args.c)
 
-    # load data
-    data = load_bed(args.bed, size, info, args.b, args.mt_name, args.selected)
+    # rNMP counts of all libraries, EF of any bin size is derived from them
+    samples, prefix = load_prefix(args.bed, size, info, args.mt_name, args.selected, not args.no_cache, args.f)
+    totals = prefix[:, :, -1]
+    celltypes = pd.factorize(np.array([info[fs] for fs in samples]))[0]
 
-    # enriched zones
-    rezs, common = get_rez(data, args.ef_threshold, args.sample_threshold)
-    rezs.to_csv(f'{args.o}_rezs.tsv', sep='\t', index=False)
-    common.to_csv(f'{args.o}_common_rezs.tsv', sep='\t', index=False)
+    # enriched zones of each bin size
+    for bin in args.sweep or [args.b]:
+        data = sweep_ef(samples, prefix, info, size, bin)
+        rezs, common = get_rez(data, args.ef_threshold, args.sample_threshold)
+        if args.permutations:
+            common = permutation_test(
+                common, totals, celltypes, size, bin, args.ef_threshold,
+                args.permutations, args.p, seed=args.seed
+            )
+        out = f'{args.o}_b{bin}' if args.sweep else args.o
+        rezs.to_csv(f'{out}_rezs.tsv', sep='\t', index=False)
+        common.to_csv(f'{out}_common_rezs.tsv', sep='\t', index=False)
+    if args.sweep:
+        print('Done!')
+        return
 
     # draw
     draw(
         rezs, common, size, args.b, args.o, args.order, args.palette, 
         tick_interval=args.t, draw_legend=args.legend, no_annot=args.no_annot,
-        show_loc=args.show_loc
+        show_loc=args.show_loc, processes=args.p
     )
 
     print('Done!')
@@ -3,7 +3,10 @@
 import argparse
 from collections import defaultdict
 import sys
+import os
 import pandas as pd
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from composition import is_fasta, load_index, query_index
 
 # read gtf
 def read_gtf(fr):
@@ -67,6 +70,17 @@ def read_mono(fr, s):
     else:
         return pd.DataFrame.from_dict(data, orient='index', columns=['T_bg', 'G_bg', 'C_bg', 'A_bg', 'rNMP_strand'])
 
+# background count for each gene from the k-mer index of the reference genome
+def index_mono(fr, cds_info, s, name='chrM'):
+    index = load_index(fr, name)
+    opposite = {'+':'-', '-':'+'}
+    data = {}
+    for _, x in cds_info.iterrows():
+        # rNMPs are on the gene strand for nontemplate, on the opposite strand for template
+        st = x.Strand if s == 'nontemplate' else opposite[x.Strand]
+        data[generate_loc(x)] = query_index(index, 'mono', (st,), [(x.Start, x.End)]).astype(float).tolist() + [s]
+    return pd.DataFrame.from_dict(data, orient='index', columns=['A_bg', 'C_bg', 'G_bg', 'T_bg', 'rNMP_strand'])
+
 # function to generate loc columns in df
 def generate_loc(x):
     name = f'{x.Start}-{x.End}({x.Strand})'
@@ -79,10 +93,12 @@ def main():
     parser.add_argument('info', type=argparse.FileType('r'), help='List of library information')
     parser.add_argument('gtf', type=argparse.FileType('r'), help='GTF annotation')
     parser.add_argument('mito_count', type=argparse.FileType('r'), help='CSV file of mitochondrial rNMP count for each library')
-    parser.add_argument('bg_count', type=argparse.FileType('r'), help='TSV file of mitochondrial rNMP count for each gene')
+    parser.add_argument('bg_count', type=argparse.FileType('r'), help='TSV file of mitochondrial rNMP count for each gene, ' + \
+        'or reference genome fasta to count the background of each gene from its k-mer index')
     parser.add_argument('-c', type=int, default=1, help='Column number of library name in libinfo, default=1')
     parser.add_argument('-s', choices={'template', 'nontemplate'}, default='nontemplate', help='Input strand: template/(nontemplate)')
     parser.add_argument('--mt_size', type=int, default=16569*2, help='mtDNA size (16569*2)')
+    parser.add_argument('--mt_name', default='chrM', help='Mitochondria name in reference genome, default=chrM')
     parser.add_argument('-o', default=sys.stdout, type=argparse.FileType('w'), help='Output to file')
     args = parser.parse_args()
     args.c -= 1
@@ -92,7 +108,10 @@ def main():
     libinfo = read_libinfo(args.info, args.c)
     df = read_data(args.raw)
     mito_count = read_mito_count(args.mito_count)
-    bg_count = read_mono(args.bg_count, args.s)
+    if is_fasta(args.bg_count):
+        bg_count = index_mono(args.bg_count, cds_info, args.s, args.mt_name)
+    else:
+        bg_count = read_mono(args.bg_count, args.s)
 
     # add information
     df['Total_chrM_rNMPs'] = df.Library.map(mito_count)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import argparse
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from rnmp_library import load_libraries, weights
+from composition import bases, read_fasta, encode as encode_bases
+
+
+# base index (ACGT) at each position for rNMPs on both strands, -1 for other bases
+def encode(seq):
+    codes = encode_bases(seq)
+    # rNMPs on the reverse strand are the complement, A<->T and C<->G
+    return {'+':codes, '-':np.where(codes >= 0, 3 - codes, -1)}
+
+
+# read gene intervals from gtf, coordinates are used as they are in ref_bed
+def read_genes(fr):
+    genes = []
+    for l in fr:
+        ws = l.rstrip().split('\t')
+        if len(ws) > 8:
+            gene_id = ws[-1].split('; ')[0].rstrip('\"').replace('gene_id \"', '')
+            genes.append((gene_id, int(ws[3]), int(ws[4]), ws[6]))
+    return genes
+
+
+# sorted rNMP positions and prefix sums of each base for both strands
+def index_library(lib, codes):
+    index = {}
+    w = weights(lib)
+    if 'count' not in lib:
+        w = w.astype(np.int64)
+    for st, mask in [('+', lib['plus']), ('-', ~lib['plus'])]:
+        order = np.argsort(lib['loc'][mask], kind='stable')
+        loc = lib['loc'][mask][order]
+        base = np.full(len(loc), -1)
+        inside = loc < len(codes[st])
+        base[inside] = codes[st][loc[inside]]
+        counts = (base == np.arange(len(bases))[:, None]) * w[mask][order]
+        index[st] = (loc, np.pad(np.cumsum(counts, axis=1), ((0, 0), (1, 0))))
+    return index
+
+
+# rNMP count of each base in genes, (gene x base)
+def count_genes(index, genes):
+    starts = np.array([x[1] for x in genes], dtype=np.int64)
+    ends = np.array([x[2] for x in genes], dtype=np.int64)
+    plus = np.array([x[3] == '+' for x in genes])
+    counts = {}
+    for st, (loc, prefix) in index.items():
+        lo = np.searchsorted(loc, starts)
+        hi = np.searchsorted(loc, ends)
+        counts[st] = (prefix[:, hi] - prefix[:, lo]).T
+    # nontemplate: rNMPs on the gene strand, template: on the opposite strand
+    return {
+        'nontemplate':np.where(plus[:, None], counts['+'], counts['-']),
+        'template':np.where(plus[:, None], counts['-'], counts['+'])
+    }
+
+
+# output raw counts, one row for each library and gene
+def write_raw(fw, results, genes, st, name):
+    fw.write('Sample\t' + '\t'.join(bases) + '\n')
+    for lib in sorted(results):
+        for (gene, _, _, _), c in zip(genes, results[lib][st]):
+            fw.write(f'{name}_{lib}_{gene}_{st}\t' + '\t'.join(str(x) for x in c.tolist()) + '\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count rNMPs of each base on template and nontemplate strands of genes')
+    parser.add_argument('fasta', type=argparse.FileType('r'), help='Reference genome fasta')
+    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='rNMP incorporation bed files or library stores')
+    parser.add_argument('-g', '--gtf', type=argparse.FileType('r'), nargs='+', required=True, help='Gene annotations, ' + \
+        '{gtf}_template.raw and {gtf}_nontemplate.raw are generated for each file')
+    parser.add_argument('-o', default='.', help='Output folder, (.)')
+    parser.add_argument('-f', type=int, default=0, help='Read rNMP frequency from which column? (one rNMP per line by default)')
+    parser.add_argument('--mt_name', default='chrM', help='Mitochondria name in reference genome, default=chrM')
+    parser.add_argument('--no_cache', '--no-cache', action='store_true', help='Do not use cached libraries')
+    args = parser.parse_args()
+
+    # genome
+    codes = encode(read_fasta(args.fasta, args.mt_name))
+
+    # index each library once
+    index = {lib:index_library(cols, codes) for lib, cols in load_libraries(args.bed, args.mt_name, not args.no_cache, args.f).items()}
+
+    # count genes of each annotation
+    os.makedirs(args.o, exist_ok=True)
+    for fr in args.gtf:
+        genes = read_genes(fr)
+        results = {lib:count_genes(idx, genes) for lib, idx in index.items()}
+        ty = os.path.basename(fr.name).rsplit('.', 1)[0]
+        for st in ['template', 'nontemplate']:
+            with open(f'{args.o}/{ty}_{st}.raw', 'w') as fw:
+                write_raw(fw, results, genes, st, args.mt_name)
+
+    print('Done!')
+
+
+if __name__ == '__main__':
+    main()
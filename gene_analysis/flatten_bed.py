@@ -4,7 +4,8 @@ import argparse
 import sys
 
 def main():
-    parser = argparse.ArgumentParser(description='Flatten bed with frequencies to one line per rNMP')
+    parser = argparse.ArgumentParser(description='Flatten bed with frequencies to one line per rNMP, ' + \
+        'only needed for tools without a frequency column option (-f)')
     parser.add_argument('bed', type=argparse.FileType('r'), help='Input BED file')
     parser.add_argument('-o', default=sys.stdout, type=argparse.FileType('w'), help='Output to file')
     parser.add_argument('-c', default=4, type=int, help='Column number for frequency, default=4')
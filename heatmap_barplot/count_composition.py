@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import argparse
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from rnmp_library import load_libraries
+from composition import read_fasta, encode, kmer_tables, background_name, kmers, features, feature_codes, \
+    load_index, query_index, pool_libraries, count_kmers, normalize, group_len
+
+
+# read order, libraries in order with their genotypes
+def read_order(fr, c):
+    order = []
+    for l in fr:
+        ws = l.rstrip().split('\t')
+        if len(ws) <= c:
+            continue
+        name = ws.pop(c)
+        order.append((name, '-'.join(ws)))
+    return order
+
+
+# read background counts of a chromosome from a background file
+def read_background(fr, chrom):
+    header = fr.readline().rstrip('\n').split('\t')
+    for l in fr:
+        ws = l.rstrip('\n').split('\t')
+        if ws[0] == chrom:
+            return {k:float(v) for k, v in zip(header[1:], ws[1:])}
+    assert False, f'Cannot find background of {chrom} in {fr.name}!'
+
+
+# output a table, one row for each sample
+def write_table(fn, samples, feas, values):
+    with open(fn, 'w') as fw:
+        fw.write('Sample\t' + '\t'.join(feas) + '\n')
+        for sample, row in zip(samples, values):
+            fw.write(f'{sample}\t' + '\t'.join(str(x) for x in row.tolist()) + '\n')
+
+
+# output a table with libraries sorted by order and renamed to {genotype}-{library}
+def write_resorted(fn, libs, feas, values, order):
+    index = {lib:i for i, lib in enumerate(libs)}
+    rows = [(f'{geno}-{lib}', values[index[lib]]) for lib, geno in order if lib in index]
+    write_table(fn, [x[0] for x in rows], feas, [x[1] for x in rows])
+
+
+def main():
+    # argparse
+    parser = argparse.ArgumentParser(description='Count mono-, di- and trinucleotide rNMP composition of all libraries. ' + \
+        'Raw counts ({o}/raw/{name}_{table}.raw), normalized frequencies ({o}/normalized/{name}_{table}.norm), ' + \
+        'sorted tables ({o}/tsv/{name}_{table}.tsv) and backgrounds ({o}/bg) are generated.')
+    parser.add_argument('fasta', type=argparse.FileType('r'), help='Reference genome fasta')
+    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='rNMP incorporation bed files or library stores')
+    parser.add_argument('-o', default='.', help='Output folder, (.)')
+    parser.add_argument('--order', type=argparse.FileType('r'), default=None, help='Library information, sorted tables are generated if given')
+    parser.add_argument('-c', type=int, default=2, help='Col num for FS number in library information, default=2')
+    parser.add_argument('--tables', default=['mono', 'dinuc', 'trinuc'], nargs='+', choices=['mono', 'dinuc', 'trinuc'], \
+        help='Tables to count, (mono dinuc trinuc)')
+    parser.add_argument('--dist', type=int, default=[1, 2, 3, 4, 5, 100], nargs='+', help='Distances of dinucleotides, (1 2 3 4 5 100)')
+    parser.add_argument('--strand_split', action='store_true', help='Count rNMPs on light ({table}_light) and heavy ({table}_heavy) strands separately')
+    parser.add_argument('--bg', type=argparse.FileType('r'), default=None, help='Background counts for normalization instead of the genome')
+    parser.add_argument('--bg_chrom', default=None, help='Name of the background in --bg file, (--name)')
+    parser.add_argument('--name', default=None, help='Name of output files, (--mt_name)')
+    parser.add_argument('-f', type=int, default=0, help='Read rNMP frequency from which column? (one rNMP per line by default)')
+    parser.add_argument('--mt_name', default='chrM', help='Mitochondria name in reference genome, default=chrM')
+    parser.add_argument('--no_cache', '--no-cache', action='store_true', help='Do not use cached libraries')
+    args = parser.parse_args()
+    args.name = args.name or args.mt_name
+    args.bg_chrom = args.bg_chrom or args.name
+
+    # genome and libraries
+    codes = encode(read_fasta(args.fasta, args.mt_name))
+    libs = load_libraries(args.bed, args.mt_name, not args.no_cache, args.f)
+    names = sorted(libs)
+    pooled = pool_libraries({x:libs[x] for x in names}, len(codes))
+    order = read_order(args.order, args.c - 1) if args.order else None
+    given = read_background(args.bg, args.bg_chrom) if args.bg else None
+    index = load_index(args.fasta, args.mt_name, args.dist, not args.no_cache) if given is None else None
+    tables = {k:v for k, v in kmer_tables(args.dist).items() if k.split('_')[0] in args.tables}
+
+    for folder in ['raw', 'normalized', 'tsv', 'bg']:
+        os.makedirs(f'{args.o}/{folder}', exist_ok=True)
+    # all rNMPs on both strands, or light (+) and heavy (-) strands separately
+    variants = {'_light':('+',), '_heavy':('-',)} if args.strand_split else {'':('+', '-')}
+    written = set()
+    for suffix, strands in variants.items():
+        prefix = f'{args.name}_{{}}{suffix}'
+        for table, offsets in tables.items():
+            feas = features(offsets)
+            reorder = feature_codes(offsets)
+            # background in output order
+            if given is None:
+                bg = query_index(index, background_name(table), strands)
+                bg_fn = f'{args.o}/bg/{prefix.format(background_name(table))}.raw'
+                if bg_fn not in written:
+                    write_table(bg_fn, [args.name], kmers(len(offsets)), bg[None, :])
+                    written.add(bg_fn)
+                bg = bg[reorder]
+            else:
+                bg = np.array([given[x] for x in feas])
+            # counts
+            counts = count_kmers(pooled, codes, offsets, len(names), strands)[:, reorder]
+            norm = normalize(counts, bg, group_len(offsets))
+            write_table(f'{args.o}/raw/{prefix.format(table)}.raw', names, feas, counts)
+            write_table(f'{args.o}/normalized/{prefix.format(table)}.norm', names, feas, norm)
+            if order is not None:
+                write_resorted(f'{args.o}/tsv/{prefix.format(table)}.tsv', names, feas, norm, order)
+            if table != 'mono':
+                continue
+            # fraction of each base and raw counts of mono
+            sums = counts.sum(axis=1, keepdims=True)
+            sum1 = np.divide(counts, sums, out=np.zeros(counts.shape), where=sums > 0)
+            write_table(f'{args.o}/normalized/{prefix.format("sum1")}.norm', names, feas, sum1)
+            if order is not None:
+                write_resorted(f'{args.o}/tsv/{prefix.format("mono_sum1")}.tsv', names, feas, sum1, order)
+                write_resorted(f'{args.o}/tsv/{prefix.format("mono")}_raw.tsv', names, feas, counts, order)
+
+    print('Done!')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,8 +6,12 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 import itertools as it
+import sys
+import os
 from collections import defaultdict
 from matplotlib.ticker import FixedLocator
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from composition import is_fasta, load_index, query_background, parse_intervals
 
 
 # read data and check it is mono, di or tri nucleotide
@@ -50,17 +54,22 @@ def determine_group_size(df):
 
 
 # add background frequency to label
-def add_bg_freq(labels, group_size, fr, chrom):
+# fr is a background file, or a fasta file whose k-mer index is queried on strands in regions
+def add_bg_freq(labels, group_size, fr, chrom, dist=1, strands=('+', '-'), regions=None):
     # get bg freq from background
     freqs = {x.replace('U', 'T'):None for x in labels}
-    features = fr.readline().rstrip('\n').split('\t')[1:]
-    for l in fr:
-        ws = l.split('\t')
-        if ws[0] == chrom:
-            ws = ws[1:]
-            for i in range(len(ws)):
-                freqs[features[i]] = float(ws[i])
-            break
+    if is_fasta(fr):
+        table = {1:'mono', 2:f'dinuc_d{dist}', 3:'trinuc'}[len(labels[0])]
+        freqs.update(query_background(load_index(fr, chrom, (dist,)), table, strands, regions))
+    else:
+        features = fr.readline().rstrip('\n').split('\t')[1:]
+        for l in fr:
+            ws = l.split('\t')
+            if ws[0] == chrom:
+                ws = ws[1:]
+                for i in range(len(ws)):
+                    freqs[features[i]] = float(ws[i])
+                break
     assert list(freqs.values())[0] != None, f'Cannot find all background frequencies of {chrom} in background frequency file {fr.name}!'
     labels = [[x, freqs[x.replace('U','T')]] for x in labels]
     # sum to 1
@@ -133,6 +142,10 @@ def main():
     parser.add_argument('-o', default='rNMP_heatmap.png', help='Output figure name, default= rNMP_heatmap.png')
     parser.add_argument('-b', type=argparse.FileType('r'), help='Select background file. If a file is selected, the background percentage is added to labels.')
     parser.add_argument('--background_chrom', default='chrM', help='Chromosome name of background file, default = chrM, use with -b')
+    parser.add_argument('--bg_dist', type=int, default=1, help='Dinucleotide distance for a fasta background, default = 1')
+    parser.add_argument('--bg_strand', default='both', choices=['both', '+', '-'], help='Strand for a fasta background, default = both')
+    parser.add_argument('--bg_region', default=None, nargs='+', help='Regions (start-end, 0-based) for a fasta background, ' + \
+        'start > end wraps the origin, default = whole chromosome')
     parser.add_argument('--no_annot', action='store_true', help='Hide percentage annotation in each cell')
     parser.add_argument('--palette', default='icefire', help='Define the palette used for the heatmap')
     args = parser.parse_args()
@@ -147,7 +160,10 @@ def main():
     
     # read background frequency
     if args.b:
-        labels = add_bg_freq(labels, group_size, args.b, args.background_chrom)
+        strands = ('+', '-') if args.bg_strand == 'both' else (args.bg_strand,)
+        labels = add_bg_freq(
+            labels, group_size, args.b, args.background_chrom, args.bg_dist, strands, parse_intervals(args.bg_region)
+        )
 
     # draw heatmaps
     draw(df, labels, args.o, args.no_annot, args.palette)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+from multiprocessing import Pool
+import argparse
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from rnmp_library import get_name
+
+
+# count rNMPs of each strand of a bed file in one pass, rNMP frequency is read from column fid if given
+# rNMPs on chromosome mt_name are counted, lines are split into strand files in out_dir if given
+def split_library(task):
+    fn, out_dir, fid, mt_name = task
+    name = get_name(fn)
+    mt_name = mt_name.encode()
+    lines = {'+':[], '-':[]}
+    counts = {'+':0, '-':0}
+    with open(fn, 'rb') as fr:
+        for l in fr:
+            ws = l.rstrip(b'\r\n').split(b'\t')
+            if len(ws) < 6:
+                continue
+            st = ws[5].decode()
+            if st not in lines:
+                continue
+            if out_dir is not None:
+                lines[st].append(l)
+            if ws[0] == mt_name:
+                counts[st] += float(ws[fid-1]) if fid else 1
+    # light: rNMPs on + strand, heavy: rNMPs on - strand
+    if out_dir is not None:
+        for st, suffix in [('+', 'light'), ('-', 'heavy')]:
+            with open(f'{out_dir}/{name}_{suffix}.bed', 'wb') as fw:
+                fw.writelines(lines[st])
+    return name, counts['+'], counts['-']
+
+
+def main():
+    # argparse
+    parser = argparse.ArgumentParser(description='Count rNMPs on light and heavy strands of rNMP incorporation bed files, ' + \
+        'optionally split them into light ({name}_light.bed) and heavy ({name}_heavy.bed) strand files by the strand column')
+    parser.add_argument('bed', nargs='+', help='rNMP incorporation bed files')
+    parser.add_argument('-o', default=None, help='Output folder of strand split bed files, not written by default')
+    parser.add_argument('-c', default=None, type=argparse.FileType('w'), help='Output rNMP count of each strand and library, ' + \
+        'input of strand_split_plot.py')
+    parser.add_argument('-f', type=int, default=0, help='Read rNMP frequency from which column? (one rNMP per line by default)')
+    parser.add_argument('--mt_name', default='chrM', help='Mitochondria name of rNMPs to count, default=chrM')
+    parser.add_argument('-p', type=int, default=1, help='Number of worker processes (1)')
+    args = parser.parse_args()
+    if args.o is None and args.c is None:
+        parser.error('at least one of -o and -c is required')
+
+    # split each library
+    if args.o is not None:
+        os.makedirs(args.o, exist_ok=True)
+    tasks = [(fn, args.o, args.f, args.mt_name) for fn in args.bed]
+    if args.p > 1 and len(tasks) > 1:
+        with Pool(args.p) as pool:
+            counts = pool.map(split_library, tasks)
+    else:
+        counts = [split_library(task) for task in tasks]
+
+    # output counts
+    if args.c:
+        args.c.write('Sample\tLight\tHeavy\tTotal\n')
+        for name, light, heavy in counts:
+            args.c.write(f'{name}\t{light}\t{heavy}\t{light + heavy}\n')
+
+    print('Done!')
+
+
+if __name__ == '__main__':
+    main()
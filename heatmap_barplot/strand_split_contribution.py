@@ -5,6 +5,10 @@ import argparse
 import matplotlib.pyplot as plt
 import pandas as pd
 import numpy as np
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from composition import is_fasta, load_index, query_background, parse_intervals
 
 
 # Load library information
@@ -15,8 +19,10 @@ def load_info(fr):
         info[ws[1]] = (i, ws[0])
     return info 
 
-# load background frequency
-def get_bg(fr, name):
+# load background frequency, from the k-mer index of the strand in regions if fr is a fasta file
+def get_bg(fr, name, strand='+', regions=None):
+    if is_fasta(fr):
+        return {k:float(v) for k, v in query_background(load_index(fr, name), 'mono', (strand,), regions).items()}
     data = {}
     header = fr.readline().rstrip('\n').split('\t')
     for l in fr:
@@ -133,10 +139,14 @@ def main():
     parser = argparse.ArgumentParser(description='Generate heatmap with rNMP contribution in either strand')
     parser.add_argument('fwd_count', type=argparse.FileType('r'), help='rNMP count for light strand')
     parser.add_argument('rev_count', type=argparse.FileType('r'), help='rNMP count for heavy strand')
-    parser.add_argument('fwd_bg', type=argparse.FileType('r'), help='background count for light strand')
-    parser.add_argument('rev_bg', type=argparse.FileType('r'), help='background count for heavy strand')
+    parser.add_argument('fwd_bg', type=argparse.FileType('r'), help='background count for light strand, or reference fasta')
+    parser.add_argument('rev_bg', type=argparse.FileType('r'), help='background count for heavy strand, or reference fasta')
     parser.add_argument('info', type=argparse.FileType('r'), help='Library information')
     parser.add_argument('--chrom', default='chrM', help='Chromosome name in background frequency files (chrM)')
+    parser.add_argument('--bg_strands', default=['+', '-'], nargs=2, choices=['+', '-'], \
+        help='Strands of light and heavy backgrounds if they are fasta files, (+ -)')
+    parser.add_argument('--bg_region', default=None, nargs='+', help='Regions (start-end, 0-based) of fasta backgrounds, ' + \
+        'start > end wraps the origin, (whole chromosome)')
     parser.add_argument('-o', default='strand_split_contribution', help='Output plot name')
     args = parser.parse_args()
 
@@ -144,8 +154,9 @@ def main():
     info = load_info(args.info)
 
     # get background frequence
-    l_bg = get_bg(args.fwd_bg, args.chrom)
-    h_bg = get_bg(args.rev_bg, args.chrom)
+    regions = parse_intervals(args.bg_region)
+    l_bg = get_bg(args.fwd_bg, args.chrom, args.bg_strands[0], regions)
+    h_bg = get_bg(args.rev_bg, args.chrom, args.bg_strands[1], regions)
 
     # Format data
     df = load_data(args.fwd_count, args.rev_count, info, l_bg, h_bg)
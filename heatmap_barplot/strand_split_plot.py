@@ -8,38 +8,52 @@ from matplotlib.ticker import PercentFormatter
 from statannotations.Annotator import Annotator
 
 
-def get_category(data):
-    return '-'.join(list(data.split('-')[:-1]))
+# read order, libraries in order with their genotypes
+def read_order(fr, c):
+    order = []
+    for l in fr:
+        ws = l.rstrip().split('\t')
+        if len(ws) <= c:
+            continue
+        name = ws.pop(c)
+        order.append((name, '-'.join(ws)))
+    return order
+
+
+# light and heavy rNMP counts of libraries in order
+def load_counts(fr, order):
+    counts = pd.read_csv(fr, sep='\t', dtype={'Sample':str}).set_index('Sample')
+    df = []
+    for lib, geno in order:
+        if lib not in counts.index:
+            continue
+        x = counts.loc[lib]
+        df.append([f'{geno}-{lib}', 'Forward', float(x.Light), geno])
+        df.append([f'{geno}-{lib}', 'Reverse', float(x.Heavy), geno])
+    df = pd.DataFrame(df, columns=['Sample', 'Strand', 'Total', 'Celltype'])
+    df['Both'] = df.Sample.map(df.groupby('Sample').Total.sum().to_dict())
+    df['Ratio'] = df['Total']/df['Both']
+    return df
 
 # generate dataframe from tsv file
 def main():
     parser = argparse.ArgumentParser(description='Generate barplot with strand split file')
-    parser.add_argument('fwd', type=argparse.FileType('r'), help='rNMP count for forward strand')
-    parser.add_argument('rev', type=argparse.FileType('r'), help='rNMP count for reverse strand')
+    parser.add_argument('counts', type=argparse.FileType('r'), help='rNMP count of each strand and library from split_strands.py -c')
+    parser.add_argument('order', type=argparse.FileType('r'), help='Library information')
+    parser.add_argument('-c', type=int, default=2, help='Col num for FS number in library information, default=2')
     parser.add_argument('-l', type=float, default=7, help='Width of the figure, (7)')
     parser.add_argument('--no_annot', action='store_true', help='Do not draw statistical annotations')
     parser.add_argument('-o', help='Output plot name')
     args = parser.parse_args()
 
     if not args.o:
-        args.o = args.tsv.name.split('.')[0] + '_strand_split.png'
+        args.o = args.counts.name.split('.')[0] + '_strand_split.png'
 
     # define color palette
     pal = ['#FB5156', '#5555FF']
 
     # generate df
-    fwd = pd.read_csv(args.fwd, sep='\t')
-    fwd['Strand'] = 'Forward'
-    rev = pd.read_csv(args.rev, sep='\t')
-    rev['Strand'] = 'Reverse'
-    df = pd.concat([fwd, rev])
-    dtypes = { x:'float' for x in ['A','C','G','T']}
-    df = df.astype(dtypes)
-    df['Total'] = df['A'] + df['C'] + df['G'] + df['T']
-    both_dict = df.groupby('Sample').sum()['Total'].to_dict()
-    df['Both'] = df.Sample.map(both_dict)
-    df['Ratio'] = df['Total']/df['Both']
-    df['Celltype'] = df.Sample.apply(get_category)
+    df = load_counts(args.counts, read_order(args.order, args.c - 1))
 
     # draw
     sns.set(font_scale=1.5, style='ticks')
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+
+# circular chrM figure and polar axes
+def polar_axes(size, tick_interval=2000, figsize=(10,10), dpi=None, font_scale=1, adjust=None):
+    sns.set(style='ticks', font_scale=font_scale)
+    fig, _ = plt.subplots(figsize=figsize, dpi=dpi)
+    if adjust:
+        plt.subplots_adjust(**adjust)
+    ax = plt.subplot(111, polar=True)
+    # theta ticks
+    ax.xaxis.set_tick_params(size=2, width=2)
+    ax.set_xticks([x*tick_interval*2*np.pi/size for x in range(size//tick_interval+1)])
+    ax.set_xticklabels([int(x*tick_interval/1000) for x in range(size//tick_interval+1)])
+    # plot position
+    ax.set_theta_zero_location('N')
+    ax.set_theta_direction(-1)
+    plt.setp(ax.spines.values(), linewidth=0)
+    # other settings
+    ax.grid(False)
+    ax.yaxis.set_visible(False)
+    return fig, ax
+
+
+# radial lines for zero and other theta ticks
+def draw_ticks(ax, size, tick_interval, top, zero_width=2, width=1):
+    ax.plot((0, 0), (0, top), color='k', linewidth=zero_width)
+    for x in range(1, size//tick_interval+1):
+        loc = x * tick_interval * np.pi * 2 / size
+        ax.plot((loc, loc), (0, top), color='k', linewidth=width)
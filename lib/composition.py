@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import itertools as it
+import os
+from rnmp_library import cache_get, cache_put, file_hash
+
+bases = 'ACGT'
+# character order of features, rNMP base first, same as the labels of draw_heatmap.py
+# key: (k-mer length, rNMP position in k-mer)
+label_orders = {(1, 0):[0], (2, 0):[0, 1], (2, 1):[1, 0], (3, 0):[0, 1, 2], (3, 1):[1, 0, 2], (3, 2):[2, 1, 0]}
+
+
+# read sequence of a chromosome from fasta
+def read_fasta(fr, name):
+    seq = []
+    found = False
+    for l in fr:
+        if l[0] == '>':
+            if found:
+                break
+            found = l[1:].split()[0] == name
+        elif found:
+            seq.append(l.strip())
+    return ''.join(seq).upper()
+
+
+# base index (ACGT) at each position, -1 for other bases
+def encode(seq):
+    codes = np.full(len(seq), -1, dtype=np.int8)
+    arr = np.frombuffer(seq.encode(), dtype=np.uint8)
+    for i, b in enumerate(bases):
+        codes[arr == ord(b)] = i
+    return codes
+
+
+# k-mer tables: name -> offsets from the rNMP in 5'->3' direction of the rNMP strand
+def kmer_tables(dists=(1, 2, 3, 4, 5, 100)):
+    tables = {'mono':(0,)}
+    for d in dists:
+        tables[f'dinuc_d{d}_nr'] = (-d, 0)
+        tables[f'dinuc_d{d}_rn'] = (0, d)
+    for pat, offsets in [('nnr', (-2, -1, 0)), ('nrn', (-1, 0, 1)), ('rnn', (0, 1, 2))]:
+        tables[f'trinuc_{pat}'] = offsets
+    return tables
+
+
+# background tables: name -> offsets in genomic order, the k-mer is read 5'->3' on each strand
+def background_tables(dists=(1, 2, 3, 4, 5, 100)):
+    tables = {'mono':(0,)}
+    for d in dists:
+        tables[f'dinuc_d{d}'] = (0, d)
+    tables['trinuc'] = (0, 1, 2)
+    return tables
+
+
+# background name of a table, dinucleotides of the same distance share a background
+def background_name(table):
+    if table.startswith('dinuc'):
+        return table.rsplit('_', 1)[0]
+    if table.startswith('trinuc'):
+        return 'trinuc'
+    return table
+
+
+# all k-mers in code order
+def kmers(k):
+    return [''.join(x) for x in it.product(bases, repeat=k)]
+
+
+# features of a table in output order, grouped by the rNMP base
+def features(offsets):
+    order = label_orders[(len(offsets), offsets.index(0))]
+    return [''.join(x[i] for i in order) for x in it.product(bases, repeat=len(offsets))]
+
+
+# code of each feature of a table, to reorder counts from code order to output order
+def feature_codes(offsets):
+    return np.array([kmers(len(offsets)).index(x) for x in features(offsets)])
+
+
+# k-mer code at each position of a circular genome, read 5'->3' on the strand, -1 if any base is unknown
+def kmer_codes(codes, offsets, strand='+'):
+    kcodes = np.zeros(len(codes), dtype=np.int64)
+    valid = np.ones(len(codes), dtype=bool)
+    for o in offsets:
+        if strand == '+':
+            c = np.roll(codes, -o)
+        else:
+            # reverse strand reads backwards on the complement
+            c = np.roll(codes, o)
+            c = np.where(c >= 0, 3 - c, -1)
+        valid &= c >= 0
+        kcodes = kcodes * 4 + c
+    return np.where(valid, kcodes, -1)
+
+
+# rNMP positions of all libraries on each strand, with library index and weight
+def pool_libraries(libs, size):
+    pooled = {}
+    for st in ['+', '-']:
+        locs, idx, ws = [], [], []
+        for i, lib in enumerate(libs.values()):
+            mask = (lib['plus'] if st == '+' else ~lib['plus']) & (lib['loc'] < size)
+            locs.append(lib['loc'][mask])
+            idx.append(np.full(mask.sum(), i, dtype=np.int64))
+            ws.append(lib['count'][mask] if 'count' in lib else np.ones(mask.sum(), dtype=np.int64))
+        pooled[st] = (np.concatenate(locs), np.concatenate(idx), np.concatenate(ws))
+    return pooled
+
+
+# rNMP count of each k-mer for all libraries at once, (library x k-mer) in code order
+def count_kmers(pooled, codes, offsets, nlib, strands=('+', '-')):
+    n = 4 ** len(offsets)
+    counts = 0
+    for st in strands:
+        loc, idx, w = pooled[st]
+        kc = kmer_codes(codes, offsets, st)[loc]
+        valid = kc >= 0
+        counts = counts + np.bincount(
+            idx[valid] * n + kc[valid], weights=w[valid], minlength=nlib * n
+        ).reshape(nlib, n)
+    if isinstance(counts, np.ndarray) and all(pooled[st][2].dtype.kind == 'i' for st in strands):
+        counts = np.rint(counts).astype(np.int64)
+    return counts
+
+
+# normalize counts by background, each group of features sharing an rNMP base sums to 1
+def normalize(counts, bg, group_len):
+    freqs = np.divide(counts, bg, out=np.zeros(counts.shape), where=bg > 0)
+    groups = freqs.reshape(len(freqs), -1, group_len)
+    sums = groups.sum(axis=2, keepdims=True)
+    return np.divide(groups, sums, out=np.zeros(groups.shape), where=sums > 0).reshape(freqs.shape)
+
+
+# group length of a table in normalized output
+def group_len(offsets):
+    return 4 if len(offsets) == 1 else 4 ** (len(offsets) - 1)
+
+
+# check whether an opened file is a fasta file without consuming it
+def is_fasta(fr):
+    return getattr(fr, 'buffer', fr).peek(1)[:1] == b'>'
+
+
+# prefix sums of k-mer counts along a circular sequence for both strands
+# each k-mer is placed at its leftmost position, k-mers spanning the origin are kept
+def build_index(codes, dists=(1, 2, 3, 4, 5, 100)):
+    index = {}
+    for table, offsets in background_tables(dists).items():
+        n = 4 ** len(offsets)
+        for st in ['+', '-']:
+            kcodes = kmer_codes(codes, offsets, st)
+            # k-mers on the reverse strand are read from their rightmost position
+            if st == '-':
+                kcodes = np.roll(kcodes, -offsets[-1])
+            onehot = np.zeros((len(codes) + 1, n), dtype=np.int32)
+            valid = np.flatnonzero(kcodes >= 0)
+            onehot[valid + 1, kcodes[valid]] = 1
+            index[f'{table}{st}'] = np.cumsum(onehot, axis=0, dtype=np.int32)
+    return index
+
+
+# k-mer index of a sequence in an opened fasta file
+# regular files are read by name and cached by file content, other streams (stdin, pipes) are read from the handle
+def load_index(fr, name='chrM', dists=(1, 2, 3, 4, 5, 100), cache=True):
+    regular = isinstance(fr.name, str) and os.path.isfile(fr.name)
+    cache = cache and regular
+    key = f'kmer_index_{file_hash(fr.name)}_{name}_d' + '_'.join(str(d) for d in dists) if cache else None
+    index = cache_get(key) if cache else None
+    if index is None:
+        if regular:
+            with open(fr.name) as f:
+                codes = encode(read_fasta(f, name))
+        else:
+            codes = encode(read_fasta(fr, name))
+        assert len(codes), f'Cannot find {name} in {fr.name}!'
+        index = build_index(codes, dists)
+        if cache:
+            cache_put(key, index)
+    return index
+
+
+# k-mer counts of a background table in code order
+# intervals: (start, end) in 0-based half open coordinates, start > end wraps the origin
+# only k-mers inside the intervals are counted, all k-mers of the circular sequence if intervals is None
+def query_index(index, table, strands=('+', '-'), intervals=None):
+    # length of the k-mer minus one
+    span = int(table[7:]) if table.startswith('dinuc_d') else (2 if table == 'trinuc' else 0)
+    counts = np.zeros(index[f'{table}+'].shape[1], dtype=np.int64)
+    for st in strands:
+        prefix = index[f'{table}{st}']
+        size = len(prefix) - 1
+        if intervals is None:
+            counts += prefix[size]
+            continue
+        for start, end in intervals:
+            # ranges of leftmost positions of k-mers inside the interval
+            ranges = [(start, end - span)] if start <= end else [(start, size + min(end - span, 0)), (0, end - span)]
+            for lo, hi in ranges:
+                if hi > lo:
+                    counts += prefix[hi] - prefix[lo]
+    return counts
+
+
+# background counts of each k-mer from the index
+def query_background(index, table, strands=('+', '-'), intervals=None):
+    counts = query_index(index, table, strands, intervals)
+    k = {4:1, 16:2, 64:3}[len(counts)]
+    return dict(zip(kmers(k), counts.tolist()))
+
+
+# intervals from strings of start-end
+def parse_intervals(regions):
+    if not regions:
+        return None
+    return [tuple(int(x) for x in r.split('-')) for r in regions]
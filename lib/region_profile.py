@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pandas as pd
+from rnmp_library import weights
+
+# labels of positions around the replication origin, sorted to group the same as strings
+region_labels = ['Downstream', 'OriH', 'Upstream']
+
+
+# read regions of interest from a bed file (chrom, start, end, name, score, strand)
+# lines of the same name are joined in order, start > end wraps the origin of the circular chromosome
+def read_regions(fr, name='chrM'):
+    regions = {}
+    for l in fr:
+        ws = l.rstrip('\n').split('\t')
+        if len(ws) < 3 or ws[0] != name:
+            continue
+        region = ws[3] if len(ws) > 3 else f'{ws[0]}:{ws[1]}-{ws[2]}'
+        st = ws[5] if len(ws) > 5 else '+'
+        regions.setdefault(region, [st, []])[1].append((int(ws[1]), int(ws[2])))
+    return {k:tuple(v) for k, v in regions.items()}
+
+
+# genomic positions of a region in order
+def region_positions(intervals, size):
+    return np.concatenate([np.arange(s, e if s <= e else e + size) % size for s, e in intervals])
+
+
+# rNMP count at each genomic position on light (+) and heavy (-) strands of all libraries
+# row 2i is the light strand of library i, row 2i+1 the heavy strand
+def strand_counts(libs, size):
+    idx, ws = [], []
+    for i, lib in enumerate(libs):
+        mask = lib['loc'] < size
+        idx.append((i * 2 + ~lib['plus'][mask]) * size + lib['loc'][mask])
+        ws.append(weights(lib)[mask])
+    return np.bincount(
+        np.concatenate(idx), weights=np.concatenate(ws), minlength=len(libs) * 2 * size
+    ).reshape(-1, size)
+
+
+# moving average of PPB (count / total rNMPs / region length) in regions for all rows
+# counts: (row x genomic position), regions: name -> (strand, intervals)
+# each row is smoothed with np.convolve in its reading direction, zero padded at both ends
+# rows are not smoothed together by a 2-D convolution, which can sum in another order and differ from the original
+# per-library profiles in the last digits, while np.convolve of each row reproduces them exactly
+# rows flagged in reverse (heavy strand) are smoothed from the genomic end of the region, then regions on - strand are reversed
+def region_profiles(counts, total, regions, flank, reverse=None):
+    size = counts.shape[1]
+    kernel = np.ones(flank*2+1)/(flank*2+1)
+    total = np.asarray(total, dtype=float).reshape(-1, 1)
+    reverse = np.zeros(len(counts), dtype=bool) if reverse is None else reverse
+    profiles = {}
+    for k, (st, intervals) in regions.items():
+        data = counts[:, region_positions(intervals, size)] / total
+        data /= data.shape[1]
+        data = np.array([
+            np.convolve(x[::-1], kernel)[flank:flank+len(x)][::-1] if r else np.convolve(x, kernel)[flank:flank+len(x)]
+            for x, r in zip(data, reverse)
+        ]).reshape(data.shape)
+        profiles[k] = data[:, ::-1] if st == '-' else data
+    return profiles
+
+
+# region code at each profile position of a strand
+def region_codes(st, cr1, cr2, oh):
+    size = cr1[1] - cr1[0] + cr2[1] - cr2[0]
+    if st == 'Light':
+        edges = [cr1[1] - cr1[0] + oh[0], cr1[1] - cr1[0] + oh[1]]
+    else:
+        edges = [cr2[1] - oh[1], cr2[1] - oh[0]]
+    # Upstream, OriH, Downstream
+    return np.array([2, 1, 0], dtype=np.int8)[np.digitize(np.arange(size), edges)]
+
+
+# moving average of PPB around the replication origin, the control region spans the origin as cr1 and cr2
+# beds: (name, columns, strand) of each library, libraries not in total are skipped
+# positions are counted from cr1 start, region labels follow the direction of each strand
+def replication_profile(beds, total, flank, cr1=(16024, 16569), cr2=(0, 576), oh=(110, 441)):
+    size = cr1[1] - cr1[0] + cr2[1] - cr2[0]
+    beds = [x for x in beds if x[0] in total]
+    names = [x[0] for x in beds]
+    sts = [x[2] for x in beds]
+    counts = strand_counts([x[1] for x in beds], max(cr1[1], cr2[1]))
+    counts = counts[[i * 2 + (st == 'Heavy') for i, st in enumerate(sts)]]
+    # heavy strand profiles are read from their 5' end
+    heavy = np.array([x == 'Heavy' for x in sts], dtype=bool).reshape(-1, 1)
+    data = region_profiles(counts, [total[x] for x in names], {'CR':('+', [cr1, cr2])}, flank, heavy.ravel())['CR']
+    pos = np.arange(size)
+    codes = {st:region_codes(st, cr1, cr2, oh) for st in set(sts)}
+    return pd.DataFrame({
+        'Library':np.repeat(names, size),
+        'Strand':np.repeat(sts, size),
+        'Position':np.where(heavy, size - 1 - pos, pos).ravel(),
+        'Moving_avg':np.where(heavy, data[:, ::-1], data).ravel(),
+        'Region':pd.Categorical.from_codes(
+            np.concatenate([codes[st] for st in sts]) if sts else np.zeros(0, dtype=np.int8), region_labels
+        )
+    })
@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import argparse
+import hashlib
+import zipfile
+import glob
+import os
+
+# on-disk cache of parsed libraries, keyed by file content
+cache_dir = os.environ.get(
+    'RNMP_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'rnmp_hmt_analysis')
+)
+# maximum total cache size in MB
+cache_size = float(os.environ.get('RNMP_CACHE_SIZE', 2048))
+
+
+# library name from file name
+def get_name(fn):
+    return fn.split('/')[-1].split('.')[0]
+
+
+# read order
+def read_libinfo(fr, c):
+    data = {}
+    for l in fr:
+        ws = l.rstrip().split('\t')
+        name = ws.pop(c)
+        data[name] = '_'.join(ws)
+    return data
+
+
+# parse rNMP bed file into columns, rNMP frequency is read from column fid if given
+def read_bed(fr, name='chrM', fid=0):
+    locs = []
+    ends = []
+    strands = []
+    freqs = []
+    for l in fr:
+        ws = l.rstrip().split('\t')
+        if len(ws) < 6:
+            continue
+        if ws[0] != name:
+            continue
+        locs.append(int(ws[1]))
+        ends.append(int(ws[2]))
+        strands.append(ws[5] == '+')
+        if fid:
+            try:
+                freqs.append(float(ws[fid-1]))
+            except ValueError:
+                print(f'[ERROR] line:{l}, column {fid-1} is not a valid frequency')
+                assert False
+    cols = {
+        'loc':np.array(locs, dtype=np.int64),
+        'end':np.array(ends, dtype=np.int64),
+        'plus':np.array(strands, dtype=bool)
+    }
+    if fid:
+        cols['count'] = np.array(freqs, dtype=float)
+    return cols
+
+
+# number of rNMPs on each line, one per line without a frequency column
+def weights(lib):
+    if 'count' in lib:
+        return lib['count']
+    return np.ones(len(lib['loc']))
+
+
+# save libraries and their information as a columnar store
+# info: library -> cell type in the order of library information, saved next to each library
+def write_store(fn, libs, name='chrM', info=None):
+    info = info or {}
+    orders = {lib:i for i, lib in enumerate(info)}
+    arrays = {
+        'chrom':np.array(name),
+        'libraries':np.array(list(libs.keys()), dtype=str),
+        'celltypes':np.array([info.get(lib, '') for lib in libs], dtype=str),
+        'orders':np.array([orders.get(lib, -1) for lib in libs], dtype=np.int64)
+    }
+    for lib, cols in libs.items():
+        for k, v in cols.items():
+            arrays[f'{lib}.{k}'] = v
+    np.savez(fn, **arrays)
+
+
+# load libraries and their information from a columnar store
+# info: library -> (cell type, order), libraries without information are left out
+def read_store(fn, name='chrM'):
+    with np.load(fn) as store:
+        if str(store['chrom']) != name:
+            raise ValueError(f'{fn} stores {store["chrom"]} instead of {name}')
+        names = store['libraries'].tolist()
+        libs = {lib:{} for lib in names}
+        for k in store.files:
+            lib, _, col = k.partition('.')
+            if lib in libs:
+                libs[lib][col] = store[k]
+        info = {
+            lib:(celltype, order) for lib, celltype, order in
+            zip(names, store['celltypes'].tolist(), store['orders'].tolist()) if order >= 0
+        }
+    return libs, info
+
+
+# check whether a file is a columnar store
+def is_store(fn):
+    return fn.endswith('.npz')
+
+
+# hash of file content
+def file_hash(fn):
+    h = hashlib.sha1()
+    with open(fn, 'rb') as fr:
+        for block in iter(lambda: fr.read(1<<20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+# get arrays from cache, None if missing or unreadable
+def cache_get(key):
+    fn = os.path.join(cache_dir, f'{key}.npz')
+    try:
+        with np.load(fn) as d:
+            data = {k:d[k] for k in d.files}
+        # mark as recently used
+        os.utime(fn)
+    except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+        return None
+    return data
+
+
+# save arrays to cache and evict least recently used entries
+def cache_put(key, data):
+    os.makedirs(cache_dir, exist_ok=True)
+    # temporary files do not end with .npz, so other processes never read or evict them
+    tmp = os.path.join(cache_dir, f'{key}.{os.getpid()}.npz.tmp')
+    with open(tmp, 'wb') as fw:
+        np.savez(fw, **data)
+    os.replace(tmp, os.path.join(cache_dir, f'{key}.npz'))
+    cache_evict()
+
+
+# remove least recently used entries until cache fits in cache_size
+def cache_evict():
+    entries = []
+    for fn in glob.glob(os.path.join(cache_dir, '*.npz')):
+        try:
+            st = os.stat(fn)
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, fn))
+    total = sum(x[1] for x in entries)
+    for _, size, fn in sorted(entries):
+        if total <= cache_size * 1024 * 1024:
+            break
+        try:
+            os.remove(fn)
+        except OSError:
+            pass
+        total -= size
+
+
+# cache key of a bed file
+def cache_key(fn, name, fid=0):
+    key = f'{file_hash(fn)}_{name}'
+    if fid:
+        key += f'_f{fid}'
+    return key
+
+
+# parse rNMP bed file with cache
+def read_bed_cached(fr, name='chrM', cache=True, fid=0):
+    if not cache or not os.path.isfile(fr.name):
+        return read_bed(fr, name, fid)
+    key = cache_key(fr.name, name, fid)
+    cols = cache_get(key)
+    if cols is None:
+        cols = read_bed(fr, name, fid)
+        cache_put(key, cols)
+    return cols
+
+
+# load rNMP libraries from bed files or columnar stores
+# with_info: also return information of libraries in stores, library -> (cell type, order)
+def load_libraries(frs, name='chrM', cache=True, fid=0, with_info=False):
+    libs = {}
+    info = {}
+    for fr in frs:
+        if is_store(fr.name):
+            fr.close()
+            stored, stored_info = read_store(fr.name, name)
+            libs.update(stored)
+            info.update(stored_info)
+        else:
+            libs[get_name(fr.name)] = read_bed_cached(fr, name, cache, fid)
+    return (libs, info) if with_info else libs
+
+
+# count rNMPs of each strand in bins, weighted by frequencies if present
+def bin_counts(lib, size, bin):
+    n = size // bin + 1
+    counts = {}
+    for st, mask in [('+', lib['plus']), ('-', ~lib['plus'])]:
+        w = lib['count'][mask] if 'count' in lib else None
+        counts[st] = np.bincount(lib['loc'][mask] // bin, weights=w, minlength=n)
+    return counts
+
+
+# load binned rNMP counts of each library, binned counts of bed files are cached
+# with_info: also return information of libraries in stores, library -> (cell type, order)
+def load_binned(frs, size, bin, name='chrM', cache=True, fid=0, with_info=False):
+    binned = {}
+    info = {}
+    for fr in frs:
+        if is_store(fr.name) or not cache or not os.path.isfile(fr.name):
+            libs, stored_info = load_libraries([fr], name, cache, fid, True)
+            info.update(stored_info)
+            for lib, cols in libs.items():
+                binned[lib] = bin_counts(cols, size, bin)
+            continue
+        key = f'{cache_key(fr.name, name, fid)}_{size}_{bin}'
+        counts = cache_get(key)
+        if counts is None:
+            counts = bin_counts(read_bed_cached(fr, name, fid=fid), size, bin)
+            cache_put(key, counts)
+        binned[get_name(fr.name)] = counts
+    return (binned, info) if with_info else binned
+
+
+# build a columnar store from bed files
+def main():
+    parser = argparse.ArgumentParser(description='Convert rNMP bed files into a columnar library store')
+    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='rNMP incorporation bed files')
+    parser.add_argument('-o', default='libraries.npz', help='Output store, (libraries.npz)')
+    parser.add_argument('-c', type=int, default=2, help='Col num for FS number in library information, default=2')
+    parser.add_argument('--libinfo', type=argparse.FileType('r'), default=None, help='Library information, cell type and order of each library are saved in the store')
+    parser.add_argument('-f', type=int, default=0, help='Read rNMP frequency from which column? (one rNMP per line by default)')
+    parser.add_argument('--mt_name', default='chrM', help='Mitochondria name in reference genome, default=chrM')
+    parser.add_argument('--no_cache', '--no-cache', action='store_true', help='Do not use cached libraries')
+    args = parser.parse_args()
+
+    libs = load_libraries(args.bed, args.mt_name, not args.no_cache, args.f)
+    info = read_libinfo(args.libinfo, args.c-1) if args.libinfo else {}
+    write_store(args.o, libs, args.mt_name, info)
+
+    print('Done!')
+
+
+if __name__ == '__main__':
+    main()
@@ -6,6 +6,9 @@ import argparse
 import matplotlib.pyplot as plt
 import seaborn as sns
 import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from circular_plot import polar_axes, draw_ticks
 
 
 # get mitochondrial DNA size
@@ -50,9 +53,7 @@ def load_hotspots(fr):
 # draw circular barplot
 def draw(muts, hotspots, size, out, scale_pos=1.1*np.pi, tick_interval=2000):
     # colors = {'+':'#FB5156', '-':'#5555FF'}
-    sns.set(style='ticks', font_scale=2)
-    fig, _ = plt.subplots(figsize=(6,6), dpi=300)
-    ax = plt.subplot(111, polar=True)
+    fig, ax = polar_axes(size, tick_interval, figsize=(6,6), dpi=300, font_scale=2)
     width = 30 / size * 2 * np.pi
     # limits
     mx = max([x[1] for x in hotspots])
@@ -77,26 +78,11 @@ def draw(muts, hotspots, size, out, scale_pos=1.1*np.pi, tick_interval=2000):
                     color=['green'],
                     linewidth=0.2
                     )
-    # theta ticks
-    ax.xaxis.set_tick_params(size=2, width=2)
-    ax.set_xticks([x*tick_interval*2*np.pi/size for x in range(size//tick_interval+1)])
-    ax.set_xticklabels([int(x*tick_interval/1000) for x in range(size//tick_interval+1)])
     # limits
     plt.ylim((-mx, mx*0.5))
     ax.set_rorigin(-mx*0.6)
-    # plot a line for zero
-    plt.plot((0,0), (0, mx*0.5), color='k', linewidth=4)
-    # plot other small ticks
-    for x in range(1, size//tick_interval+1):
-        loc = x * tick_interval * np.pi * 2 / size
-        plt.plot((loc, loc), (0, mx*0.5), color='k', linewidth=2)
-    # draw an r scale
-    ax.yaxis.set_visible(False)
-    ax.set_theta_zero_location('N')
-    ax.set_theta_direction(-1)
-    plt.setp(ax.spines.values(), linewidth=0)
-    # other settings
-    ax.grid(False)
+    # plot a line for zero and other small ticks
+    draw_ticks(ax, size, tick_interval, mx*0.5, 4, 2)
     fig.savefig(out)
     plt.close('all')
 
@@ -1,8 +1,89 @@
 #!/usr/bin/env python3
 
+from itertools import groupby
+import numpy as np
+import hashlib
+import heapq
+import tempfile
 import argparse
 import sys
 
+
+# 64-bit fingerprint of read name
+def fingerprint(rd):
+    return int.from_bytes(hashlib.blake2b(rd.encode(), digest_size=8).digest(), 'little')
+
+
+# iterate (loc, st, rd) of a coordinate-sorted bed file
+def read_sorted(fr, name, shift=0, length=None):
+    prev = -1
+    for l in fr:
+        ws = l.rstrip().split('\t')
+        if len(ws) < 6:
+            continue
+        if ws[0] != name:
+            continue
+        loc = int(ws[1])
+        if loc < prev:
+            raise ValueError(f'{fr.name} is not sorted by coordinate at line: {l}')
+        prev = loc
+        if length:
+            loc = (loc + shift) % length
+        yield loc, ws[5], ws[3]
+
+
+# split CR records into runs after and before the chrM origin in a single pass
+# remapped records are spilled to the run files, fingerprints of read names are yielded
+def split_runs(fr, name, shift, length, runs):
+    for loc, st, rd in read_sorted(fr, name, shift, length):
+        runs[loc >= shift].write(f'{name}\t{loc}\t{loc+1}\t{rd}\t.\t{st}\n')
+        yield fingerprint(rd)
+
+
+# sort records with the same coordinate by strand and read name
+def sort_ties(records):
+    for _, group in groupby(records, key=lambda x:x[0]):
+        yield from sorted(group)
+
+
+# remove records whose read names are in the sorted fingerprint array
+def filter_reads(records, processed, batch=100000):
+    if not len(processed):
+        yield from records
+        return
+    while True:
+        chunk = [r for _, r in zip(range(batch), records)]
+        if not chunk:
+            break
+        fps = np.fromiter((fingerprint(r[2]) for r in chunk), dtype=np.uint64, count=len(chunk))
+        idx = np.searchsorted(processed, fps).clip(max=len(processed)-1)
+        keep = processed[idx] != fps
+        for r, k in zip(chunk, keep.tolist()):
+            if k:
+                yield r
+
+
+# k-way merge of coordinate-sorted inputs with bounded memory
+def merge_sorted(args):
+    shift = args.cr_start - 1
+    with tempfile.TemporaryFile('w+') as fw_wrapped, tempfile.TemporaryFile('w+') as fw_linear:
+        # fingerprints of read names in CR, rNMPs in CR after and before chrM origin are kept in runs
+        processed = np.fromiter(
+            split_runs(args.bed_CR, args.cr_name, shift, args.chrM_length, [fw_wrapped, fw_linear]), dtype=np.uint64
+        )
+        processed = np.unique(processed)
+        fw_wrapped.seek(0)
+        fw_linear.seek(0)
+        # runs of CR and rNMPs in chrM
+        streams = [
+            sort_ties(read_sorted(fw_wrapped, args.cr_name)),
+            sort_ties(read_sorted(fw_linear, args.cr_name)),
+            filter_reads(sort_ties(read_sorted(args.bed_mt, args.mt_name)), processed)
+        ]
+        for d in heapq.merge(*streams):
+            args.o.write(f'{args.mt_name}\t{d[0]}\t{d[0]+1}\t{d[2]}\t.\t{d[1]}\n')
+
+
 def main():
     parser = argparse.ArgumentParser(description='Merge the bed files for chrM and control region alignment')
     parser.add_argument('bed_mt', type=argparse.FileType('r'), help='rNMP bed file for linear chrM')
@@ -12,8 +93,14 @@ def main():
     parser.add_argument('--mt_name', default='chrM', help='chrM sequence name (chrM)')
     parser.add_argument('--cr_start', default=16024, type=int, help='1-based start coordinate of control region (16,024)')
     parser.add_argument('--chrM_length', default=16569, type=int, help='chrM length (16,569)')
+    parser.add_argument('--sorted', action='store_true', help='Inputs are sorted by coordinate, merge them in streaming mode with bounded memory')
     args = parser.parse_args()
 
+    if args.sorted:
+        merge_sorted(args)
+        print('Done!')
+        return
+
     # load all rNMPs in CR
     data = []
     processed = set()
@@ -1,31 +1,132 @@
 #!/usr/bin/env python3
 
 import argparse
+import tempfile
+import heapq
 import sys
+import os
+
+
+# fold rNMP records to chrM coordinates
+def fold(fr, length):
+    for l in fr:
+        ws = l.rstrip().split('\t')
+        if len(ws) < 6:
+            continue
+        ws[1] = int(ws[1]) % length
+        ws[2] = ws[1] + 1
+        yield ws
+
+
+# format a folded record
+def to_line(d):
+    d[1] = str(d[1])
+    d[2] = str(d[2])
+    return '\t'.join(d) + '\n'
+
+
+# sort key of a formatted record
+def line_key(l):
+    ws = l.split('\t', 6)
+    return int(ws[1]), ws[5].rstrip('\n')
+
+
+# check whether records are already sorted after folding
+def is_sorted(fn, length):
+    prev = None
+    with open(fn) as fr:
+        for d in fold(fr, length):
+            key = (d[1], d[5])
+            if prev is not None and key < prev:
+                return False
+            prev = key
+    return True
+
+
+# write sorted runs to temporary files, each run uses about max_memory bytes of input
+# runs are merged by level, fan_in runs of a level are merged into one run of the next level,
+# so each record is rewritten once per level and the number of open runs is bounded
+def spill_runs(fr, length, max_memory, tmp_dir, fan_in=64):
+    levels = [[]]
+    buffer = []
+    size = 0
+    for d in fold(fr, length):
+        l = to_line(d)
+        buffer.append(l)
+        size += len(l)
+        if size >= max_memory:
+            levels[0].append(write_run(buffer, tmp_dir))
+            buffer = []
+            size = 0
+            for i in range(len(levels)):
+                if len(levels[i]) < fan_in:
+                    break
+                if i + 1 == len(levels):
+                    levels.append([])
+                levels[i+1].append(merge_run(levels[i], tmp_dir))
+                levels[i] = []
+    if buffer:
+        levels[0].append(write_run(buffer, tmp_dir))
+    # older runs first, so that ties keep the input order
+    return [run for level in levels[::-1] for run in level]
+
+
+# write one sorted run
+def write_run(buffer, tmp_dir):
+    buffer.sort(key=line_key)
+    run = tempfile.TemporaryFile('w+', dir=tmp_dir)
+    run.writelines(buffer)
+    run.seek(0)
+    return run
+
+
+# merge runs into one run
+def merge_run(runs, tmp_dir):
+    run = tempfile.TemporaryFile('w+', dir=tmp_dir)
+    run.writelines(heapq.merge(*runs, key=line_key))
+    run.seek(0)
+    for r in runs:
+        r.close()
+    return run
+
+
+# external merge sort with bounded memory
+def external_sort(fr, fw, length, max_memory, tmp_dir):
+    runs = spill_runs(fr, length, max_memory, tmp_dir)
+    fw.writelines(heapq.merge(*runs, key=line_key))
+    for run in runs:
+        run.close()
+
 
 def main():
     parser = argparse.ArgumentParser(description='Process rNMP bed files aligned to extended hmtDNA genome')
     parser.add_argument('bed', type=argparse.FileType('r'), help='rNMP bed file')
     parser.add_argument('-o', type=argparse.FileType('w'), default=sys.stdout, help='Output to file')
     parser.add_argument('-l', type=int, default=16569, help='chrM length (16,569 nt)')
+    parser.add_argument('--external', action='store_true', help='Use external merge sort with bounded memory')
+    parser.add_argument('--max_memory', type=float, default=512, help='Approximate memory budget for each sorted run in external mode (512 MB of input)')
+    parser.add_argument('--tmp_dir', default=None, help='Folder for temporary sorted runs in external mode')
     args = parser.parse_args()
 
+    # already sorted input is streamed directly
+    if os.path.isfile(args.bed.name) and is_sorted(args.bed.name, args.l):
+        for d in fold(args.bed, args.l):
+            args.o.write(to_line(d))
+        print('Done!')
+        return
+
+    if args.external:
+        external_sort(args.bed, args.o, args.l, int(args.max_memory * 1024 * 1024), args.tmp_dir)
+        print('Done!')
+        return
+
     # load all rNMPs
-    data = []
-    for l in args.bed:
-        ws = l.rstrip().split('\t')
-        if len(ws) < 6:
-            continue
-        ws[1] = int(ws[1]) % args.l
-        ws[2] = ws[1] + 1
-        data.append(ws)
+    data = list(fold(args.bed, args.l))
     
     # output
     data.sort(key=lambda x:(x[1], x[5]))
     for d in data:
-        d[1] = str(d[1])
-        d[2] = str(d[2])
-        args.o.write('\t'.join(d) + '\n')
+        args.o.write(to_line(d))
 
 
     print('Done!')
@@ -33,5 +134,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-
-        
\ No newline at end of file
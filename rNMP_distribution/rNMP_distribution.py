@@ -1,11 +1,20 @@
 #!/usr/bin/env python3
 
 from collections import defaultdict
+from multiprocessing import Pool
 import numpy as np
 import argparse
+import matplotlib as mpl
+mpl.use('Agg')
 import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
 import seaborn as sns
+from io import BytesIO
 import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from circular_plot import polar_axes, draw_ticks
+from rnmp_library import load_binned
 
 
 # get mitochondrial DNA size
@@ -19,34 +28,37 @@ def get_mt_size(fai, name):
     return None
 
 
-# load rNMP coordinates
-def load_bed(bed, size, bin, name, fid):
-    data = {'+':[0]*(size//bin+1), '-':[0]*(size//bin+1)}
-    for l in bed:
-        ws = l.rstrip('\n').split('\t')
-        if len(ws) < 6:
-            continue
-        if ws[0] != name:
-            continue
-        loc = int(ws[1])
-        st = ws[5]
-        if fid:
-            try:
-                data[st][loc//bin] += float(ws[fid-1])
-            except ValueError:
-                print(f'[ERROR] line:{l}, column {fid-1} is not a valid frequency')
-                assert False
+# bed files from arguments, folders are expanded to the bed files in them
+def list_beds(paths):
+    beds = []
+    for path in paths:
+        if os.path.isdir(path):
+            beds += sorted(os.path.join(path, x) for x in os.listdir(path) if x.endswith('.bed'))
         else:
-            data[st][loc//bin] += 1
+            beds.append(path)
+    return beds
+
+
+# load binned rNMP counts of each library, weighted by frequencies in column fid if given
+# libraries of the same name from different files are rejected
+def load_all(beds, size, bin, name, fid, cache=True):
+    data = {}
+    sources = {}
+    for fn in beds:
+        fr = sys.stdin if fn == '-' else open(fn)
+        for lib, d in load_binned([fr], size, bin, name, cache, fid).items():
+            if lib in data:
+                raise ValueError(f'Library {lib} is found in both {sources[lib]} and {fn}')
+            data[lib] = d
+            sources[lib] = fn
+        fr.close()
     return data
 
 
 # draw circular barplot
 def draw(data, size, bin, out, tick_interval=2000, scale_pos=1.1*np.pi):
     colors = {'+':'#FB5156', '-':'#5555FF'}
-    sns.set(style='ticks', font_scale=10)
-    fig, _ = plt.subplots(figsize=(20,20))
-    ax = plt.subplot(111, polar=True)
+    fig, ax = polar_axes(size, tick_interval, figsize=(20,20), font_scale=10)
     # calc width and angles
     width = np.pi * 2 / len(data['+'])
     angles = [x*width for x in range(len(data['+']))]
@@ -55,58 +67,96 @@ def draw(data, size, bin, out, tick_interval=2000, scale_pos=1.1*np.pi):
     # plot reverse
     rev = [-x for x in data['-']]
     rev_bars = ax.bar(angles, rev, width=width, color=colors['-'], edgecolor=colors['-'], linewidth=0.2)
-    # theta ticks
-    ax.xaxis.set_tick_params(size=2, width=2)
-    ax.set_xticks([x*tick_interval*2*np.pi/size for x in range(size//tick_interval+1)])
-    ax.set_xticklabels([int(x*tick_interval/1000) for x in range(size//tick_interval+1)])
     # limits
     mx = max(max(data['+']), max(data['-']))
     plt.ylim((-mx/2, mx/2))
     ax.set_rorigin(-mx*0.6)
-    # plot a line for zero
-    plt.plot((0,0), (0, mx*0.4), color='k', linewidth=4)
-    # plot other small ticks
-    for x in range(1, size//tick_interval+1):
-        loc = x * tick_interval * np.pi * 2 / size
-        plt.plot((loc, loc), (0, mx*0.4), color='k', linewidth=2)
+    # plot a line for zero and other small ticks
+    draw_ticks(ax, size, tick_interval, mx*0.4, 4, 2)
     # draw an r scale
-    ax.yaxis.set_visible(False)
     # plt.plot((scale_pos - 3/180*np.pi, scale_pos + 3/180*np.pi), (max(data['+']), max(data['+'])), color='k', linewidth=1.5)
     # plt.plot((scale_pos - 5/180*np.pi, scale_pos + 5/180*np.pi), (-max(data['-']), -max(data['-'])), color='k', linewidth=1.5)
     # plt.plot((scale_pos, scale_pos), (max(data['+']), -max(data['-'])), color='k', linewidth=1.5)
     # plt.text(scale_pos, max(data['+'])*1.05, str(max(data['+'])), ha='center', va='top', rotation=scale_pos/np.pi*180+180, rotation_mode='anchor')
     # plt.text(scale_pos, -max(data['-'])*0.95, str(max(data['-'])), ha='center', va='bottom', rotation=scale_pos/np.pi*180+180, rotation_mode='anchor')
-    # plot position
-    ax.set_theta_zero_location('N')
-    ax.set_theta_direction(-1)
-    plt.setp(ax.spines.values(), linewidth=0)
-    # other settings
-    ax.grid(False)
     fig.savefig(out)
     plt.close('all')
+    return fig
+
+
+# draw one library in a worker, return the png image and its dpi for the pdf
+def draw_library(task):
+    data, size, bin, out, tick_interval, keep = task
+    fig = draw(data, size, bin, out, tick_interval=tick_interval)
+    if not keep:
+        return None
+    buf = BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue(), fig.dpi
+
+
+# add a png image as a pdf page of the same size
+def add_page(pdf, png, dpi):
+    img = plt.imread(BytesIO(png))
+    fig = plt.figure(figsize=(img.shape[1]/dpi, img.shape[0]/dpi), dpi=dpi)
+    ax = fig.add_axes([0, 0, 1, 1])
+    ax.imshow(img, interpolation='none')
+    ax.axis('off')
+    pdf.savefig(fig, dpi=dpi)
+    plt.close(fig)
+
 
+# draw libraries in order, with a worker pool if processes > 1
+def draw_all(tasks, processes):
+    if processes > 1:
+        with Pool(processes) as pool:
+            yield from pool.imap(draw_library, tasks)
+    else:
+        yield from map(draw_library, tasks)
 
 
 def main():
     # argparse
     parser = argparse.ArgumentParser(description='Draw circular barplot for rNMP incorporation in mitonchondrial DNA')
-    parser.add_argument('bed', type=argparse.FileType('r'), help='rNMP incorporation bed file')
+    parser.add_argument('bed', nargs='+', help='rNMP incorporation bed file(s), library stores or folders of bed files')
     parser.add_argument('fai', type=argparse.FileType('r'), help='Fasta index file')
-    parser.add_argument('-o', default='mt.png', help='Output figure name, (mt.png)')
+    parser.add_argument('-o', default='mt.png', help='Output figure name for a single library, (mt.png)')
+    parser.add_argument('-p', type=int, default=1, help='Number of worker processes for figures (1)')
+    parser.add_argument('--out_dir', default=None, help='Output folder for multiple libraries, one {library}.png for each library')
+    parser.add_argument('--pdf', default=None, help='Also save all figures into this multi-page pdf, one png image for each page')
     parser.add_argument('-b', type=int, default=100, help='Bin size, default=100nt')
     parser.add_argument('-t', type=int, default=2000, help='Tick interval, default=2,000nt')
     parser.add_argument('-f', type=int, default=0, help='Read rNMP frequency from which column? (one rNMP per line by default)')
     parser.add_argument('--mt_name', default='chrM', help='Mitochondria name in reference genome (chrM)')
+    parser.add_argument('--no_cache', '--no-cache', action='store_true', help='Do not use cached libraries')
     args = parser.parse_args()
 
     # mt size
     size = get_mt_size(args.fai, args.mt_name)
 
     # load data
-    data = load_bed(args.bed, size, args.b, args.mt_name, args.f)
+    try:
+        data = load_all(list_beds(args.bed), size, args.b, args.mt_name, args.f, not args.no_cache)
+    except ValueError as e:
+        parser.error(str(e))
+    if len(data) > 1 and args.out_dir is None:
+        parser.error('--out_dir is required for multiple libraries')
 
     # draw
-    draw(data, size, args.b, args.o, tick_interval=args.t)
+    if args.out_dir is None:
+        outs = {lib:args.o for lib in data}
+    else:
+        os.makedirs(args.out_dir, exist_ok=True)
+        outs = {lib:f'{args.out_dir}/{lib}.png' for lib in data}
+    tasks = [(d, size, args.b, outs[lib], args.t, args.pdf is not None) for lib, d in data.items()]
+    figs = draw_all(tasks, args.p)
+    if args.pdf is None:
+        for _ in figs:
+            pass
+    else:
+        with PdfPages(args.pdf) as pdf:
+            for png, dpi in figs:
+                add_page(pdf, png, dpi)
 
     print('Done!')
 
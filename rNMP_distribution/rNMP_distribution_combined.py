@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 
-from collections import defaultdict
 import numpy as np
 import argparse
 import matplotlib.pyplot as plt
 import seaborn as sns
 import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'lib'))
+from circular_plot import polar_axes, draw_ticks
+from rnmp_library import read_libinfo, load_binned
 
 
 # get mitochondrial DNA size
@@ -19,45 +22,36 @@ def get_mt_size(fai, name):
     return None
 
 
-# load rNMP coordinates
-def load_bed(bed, size, info, counts, bin, name, selected):
-    data = {}
-    geno_counts = {k:0 for k in info.values()}
-    for fr in bed:
-        fs = fr.name.split('/')[-1].split('.')[0]
+# bin each library once into a library x strand x bin matrix of normalized counts
+# cell types saved in library stores are added to info
+def load_matrix(bed, size, info, counts, bin, name, selected, cache=True, fid=0):
+    fss = []
+    genos = []
+    matrix = []
+    binned, stored = load_binned(bed, size, bin, name, cache, fid, with_info=True)
+    info.update({fs:celltype for fs, (celltype, _) in stored.items()})
+    for fs, lib in binned.items():
         if fs not in info or fs not in counts:
             print(f'Library {fs} doesn\'t have related information or counts, skipped')
             continue
-        geno = info[fs]
-        if geno not in selected:
+        if info[fs] not in selected:
             continue
-        geno_counts[geno] += 1
-        if geno not in data:
-            data[geno] = {'+':[0]*(size//bin+1), '-':[0]*(size//bin+1)}
-        for l in fr:
-            ws = l.rstrip('\n').split('\t')
-            if len(ws) < 6:
-                continue
-            if ws[0] != name:
-                continue
-            loc = int(ws[1])
-            st = ws[5]
-            data[geno][st][loc//bin] += 1/counts[fs]*size/bin
-    for geno in data.keys():
-        for st in data[geno].keys():
-            for i in range(len(data[geno][st])):
-                data[geno][st][i] /= geno_counts[geno]
-    return data
+        fss.append(fs)
+        genos.append(info[fs])
+        matrix.append([lib['+'], lib['-']])
+    matrix = np.array(matrix, dtype=float).reshape(len(fss), 2, size//bin+1)
+    scales = np.array([1/counts[fs]*size/bin for fs in fss])
+    return fss, genos, matrix * scales[:, None, None]
 
 
-# read order
-def read_libinfo(fr, c):
-    data = {}
-    for l in fr:
-        ws = l.rstrip().split('\t')
-        name = ws.pop(c)
-        data[name] = '_'.join(ws)
-    return data
+# mean of libraries for each genotype, genotypes are kept in loading order
+def genotype_means(genos, matrix):
+    names = list(dict.fromkeys(genos))
+    codes = np.array([names.index(x) for x in genos], dtype=int)
+    sums = np.zeros((len(names),) + matrix.shape[1:])
+    np.add.at(sums, codes, matrix)
+    means = sums / np.bincount(codes, minlength=len(names))[:, None, None]
+    return {geno:{'+':means[i, 0], '-':means[i, 1]} for i, geno in enumerate(names)}
 
 
 # read mito count
@@ -71,75 +65,130 @@ def read_mito_count(fr):
     return data
 
 
-# draw circular barplot
-def draw(data, size, bin, out, tick_interval=2000, scale_pos=np.pi):
-    colors = {x:sns.color_palette('Set1')[i] for i, x in enumerate(data)}
+# load hotspots as (celltype, location, strand), 4th column is the celltype
+def read_hotspots(fr):
+    data = []
+    for l in fr:
+        ws = l.rstrip('\n').split('\t')
+        if len(ws) < 6:
+            continue
+        data.append((ws[3], int(ws[1]), ws[5]))
+    return data
+
+
+# draw circular lineplot, hotspots are drawn as an outer layer if given
+def draw(
+        data, size, bin, out, tick_interval=2000, scale_pos=np.pi,
+        hotspots=None, color=None, legend=True, dpi=None
+    ):
+    if not color:
+        colors = {x:sns.color_palette('Set1')[i] for i, x in enumerate(data)}
+    else:
+        colors = {x:color for x in data}
     linestyle = {'+':'-', '-':'-'}
-    sns.set(style='ticks', font_scale=2.25)
-    fig, _ = plt.subplots(figsize=(15,10))
-    plt.subplots_adjust(left=0, right=0.7)
-    ax = plt.subplot(111, polar=True)
+    if legend:
+        fig, ax = polar_axes(
+            size, tick_interval, figsize=(15,10), dpi=dpi, font_scale=2.25, adjust={'left':0, 'right':0.7}
+        )
+    else:
+        fig, ax = polar_axes(size, tick_interval, figsize=(10,10), dpi=dpi, font_scale=2.25)
     # calc width and angles
     width = np.pi * 2 / (size//bin + 1)
     angles = [x*width for x in range(size//bin + 1)] + [0]
     # each genotype
     for geno, d in data.items():
         # plot forward
-        for_bars = ax.plot(angles, d['+']+[d['+'][0]], linestyle=linestyle['+'], color=colors[geno], label=geno)
+        for_bars = ax.plot(angles, np.append(d['+'], d['+'][0]), linestyle=linestyle['+'], color=colors[geno], label=geno)
         # plot reverse
-        rev = [-x for x in d['-']+[d['-'][0]]]
+        rev = -np.append(d['-'], d['-'][0])
         rev_bars = ax.plot(angles, rev, linestyle=linestyle['-'], color=colors[geno])
-    # theta ticks
-    ax.xaxis.set_tick_params(size=2, width=2)
-    ax.set_xticks([x*tick_interval*2*np.pi/size for x in range(size//tick_interval+1)])
-    ax.set_xticklabels([int(x*tick_interval/1000) for x in range(size//tick_interval+1)])
     # limits
-    mx = max(max(max(d['+']) for d in data.values()), max(max(d['-']) for d in data.values()))
-    plt.ylim((-mx, mx))
-    # ax.set_rorigin(-2*mx)
-    # plot a line for zero
-    ax.plot([0]*50, np.linspace(0, mx*1.2, 50), 'k', linewidth=2)
-    # plot other small ticks
-    for x in range(1, size//tick_interval+1):
-        loc = x * tick_interval * np.pi * 2 / size
-        ax.plot((loc, loc), (0, mx*1.2), color='k', linewidth=1)
+    mx = max(max(d['+'].max() for d in data.values()), max(d['-'].max() for d in data.values()))
+    if hotspots is None:
+        plt.ylim((-mx, mx))
+        top = mx*1.2
+    else:
+        plt.ylim((-mx*1, mx*3))
+        ax.set_rorigin(-1.5*mx)
+        top = mx*3
+        # draw hotspots
+        colors_h = {'+':'#FB5156', '-':'#5555FF'}
+        heights_high = {'+':2.5*mx, '-':1.8*mx}
+        heights_low = {'+':2.2*mx, '-':2*mx}
+        for loc,st in hotspots:
+            loc = 2*np.pi/size*loc
+            # short lines
+            ax.plot((loc,loc), (heights_low[st], heights_high[st]), color=colors_h[st], linewidth=1)
+            # dots
+            ax.plot(loc, heights_high[st], color=colors_h[st], marker='o', markersize=10)
+    # plot a line for zero and other small ticks
+    draw_ticks(ax, size, tick_interval, top)
     # draw an r scale
-    ax.yaxis.set_visible(False)
     ax.plot(np.linspace(0, np.pi*2, num=50), [0]*50, color='k', linewidth=3)
     ax.plot(np.linspace(0, np.pi*2, num=50), [1]*50, color='k', linestyle='dotted', linewidth=1.5)
     ax.plot(np.linspace(0, np.pi*2, num=50), [-1]*50, color='k', linestyle='dotted', linewidth=1.5)
-    plt.plot((scale_pos - 3/180*np.pi, scale_pos + 3/180*np.pi), (-1, -1), color='k', linewidth=1.5)
-    plt.plot((scale_pos - 5/180*np.pi, scale_pos + 5/180*np.pi), (1, 1), color='k', linewidth=1.5)
-    plt.plot((scale_pos, scale_pos), (-1, 1), color='k', linewidth=1.5)
-    plt.text(scale_pos, 1*1.05, '1', ha='center', va='top', rotation=scale_pos/np.pi*180+180, rotation_mode='anchor')
-    plt.text(scale_pos, -1*0.95, '1', ha='center', va='bottom', rotation=scale_pos/np.pi*180+180, rotation_mode='anchor')
-    # plot position
-    ax.set_theta_zero_location('N')
-    ax.set_theta_direction(-1)
-    plt.setp(ax.spines.values(), linewidth=0)
-    plt.legend(loc=(1.1,0.1))
-    # other settings
-    ax.grid(False)
+    # this part is used to draw a scale, i.e. 1 for both light and heavy strand
+    if hotspots is None:
+        plt.plot((scale_pos - 3/180*np.pi, scale_pos + 3/180*np.pi), (-1, -1), color='k', linewidth=1.5)
+        plt.plot((scale_pos - 5/180*np.pi, scale_pos + 5/180*np.pi), (1, 1), color='k', linewidth=1.5)
+        plt.plot((scale_pos, scale_pos), (-1, 1), color='k', linewidth=1.5)
+        plt.text(scale_pos, 1*1.05, '1', ha='center', va='top', rotation=scale_pos/np.pi*180+180, rotation_mode='anchor')
+        plt.text(scale_pos, -1*0.95, '1', ha='center', va='bottom', rotation=scale_pos/np.pi*180+180, rotation_mode='anchor')
+    if legend:
+        plt.legend(loc=(1.1,0.1))
     fig.savefig(out)
     plt.close('all')
 
+    return colors
+
+
+# draw all requested figures from the same genotype means
+def draw_figures(data, hotspots, size, bin, out, layers, tick_interval=2000, scale_pos=np.pi):
+    base = out[:-4] if out.endswith('.png') else out
+    # combined
+    if 'combined' in layers:
+        draw(data, size, bin, f'{base}.png', tick_interval, scale_pos)
+    # combined with all hotspots
+    if 'hotspots' in layers:
+        draw(data, size, bin, f'{base}_hotspots.png', tick_interval, scale_pos, [x[1:] for x in hotspots])
+    # combined with "combined" hotspots, and each cell type with its own hotspots
+    if 'individual' in layers:
+        colors = draw(
+            data, size, bin, f'{base}_combined.png', tick_interval, scale_pos,
+            [x[1:] for x in hotspots if x[0] == 'combined'], dpi=300
+        )
+        for celltype, d in data.items():
+            draw(
+                {celltype:d}, size, bin, f'{base}_{celltype}.png'.replace(' ', '-'), tick_interval, scale_pos,
+                [x[1:] for x in hotspots if x[0] == celltype], colors[celltype], False, 300
+            )
 
 
 def main():
     # argparse
-    parser = argparse.ArgumentParser(description='Draw combined circular barplot for rNMP incorporation in mitonchondrial DNA')
-    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='rNMP incorporation bed files')
+    parser = argparse.ArgumentParser(description='Draw combined circular barplot for rNMP incorporation in mitonchondrial DNA, ' + \
+                                                'optionally along with hotspots and individual plots for each cell type.')
+    parser.add_argument('bed', type=argparse.FileType('r'), nargs='+', help='rNMP incorporation bed files or library stores')
     parser.add_argument('fai', type=argparse.FileType('r'), help='Fasta index file')
     parser.add_argument('libinfo', type=argparse.FileType('r'), help='Library information')
     parser.add_argument('count', type=argparse.FileType('r'), help='rNMP count for each library')
-    parser.add_argument('-o', default='mt.png', help='Output figure name, (mt.png)')
+    parser.add_argument('-o', default='mt.png', help='Output figure name, other layers are saved as {name}_{layer}.png, (mt.png)')
     parser.add_argument('-c', type=int, default=2, help='Col num for FS number, default=2')
     parser.add_argument('-b', type=int, default=100, help='Bin size, default=100nt')
     parser.add_argument('-t', type=int, default=2000, help='Tick interval, default=2,000nt')
+    parser.add_argument('-f', type=int, default=0, help='Read rNMP frequency from which column? (one rNMP per line by default)')
+    parser.add_argument('--hotspots', type=argparse.FileType('r'), default=None, help='bed file for hotspots, 4th column is the celltype,' + \
+        ' "combined" for combined plot of the individual layer.')
+    parser.add_argument('--layers', default=['combined'], nargs='+', choices=['combined', 'hotspots', 'individual'], \
+        help='Figures to draw: combined ({name}.png), hotspots ({name}_hotspots.png), individual ({name}_combined.png ' + \
+        'and {name}_{celltype}.png), (combined)')
     parser.add_argument('--mt_name', default='chrM', help='Mitochondria name in reference genome, default=chrM')
     parser.add_argument('--selected', default=['CD4T', 'HEK293T', 'hESC-H9', 'DLTB', 'TLTB'], nargs='+', help='Selected genotypes, (All WT > 3)')
+    parser.add_argument('--no_cache', '--no-cache', action='store_true', help='Do not use cached libraries')
     args = parser.parse_args()
     args.c -= 1
+    if args.hotspots is None and set(args.layers) & {'hotspots', 'individual'}:
+        parser.error('--hotspots is required for hotspots and individual layers')
 
     # mt size
     size = get_mt_size(args.fai, args.mt_name)
@@ -150,11 +199,15 @@ def main():
     # load mito count
     counts = read_mito_count(args.count)
 
+    # load hotspots
+    hotspots = read_hotspots(args.hotspots) if args.hotspots else []
+
     # load data
-    data = load_bed(args.bed, size, info, counts, args.b, args.mt_name, args.selected)
+    _, genos, matrix = load_matrix(args.bed, size, info, counts, args.b, args.mt_name, args.selected, not args.no_cache, args.f)
+    data = genotype_means(genos, matrix)
 
     # draw
-    draw(data, size, args.b, args.o, tick_interval=args.t)
+    draw_figures(data, hotspots, size, args.b, args.o, args.layers, tick_interval=args.t)
 
     print('Done!')
 
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+
+import subprocess
+import filecmp
+import pytest
+import sys
+import os
+
+root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+script = os.path.join(root, 'background_calculation', 'calculate_coverage.py')
+data = os.path.join(root, 'tests', 'data', 'coverage')
+sam = os.path.join(data, 'reads.sam')
+fai = os.path.join(data, 'chrM.fa.fai')
+
+
+# run calculate_coverage.py, output file content
+def run(tmp_path, name, *args):
+    out = str(tmp_path / name)
+    subprocess.run([sys.executable, script] + list(args) + ['-o', out], check=True, capture_output=True)
+    with open(out, 'rb') as fr:
+        return fr.read()
+
+
+# chunks counted on worker processes give the same output as a single process
+def test_chunks(tmp_path):
+    for opts in [[], ['--compact'], ['--binary']]:
+        single = run(tmp_path, 'single', sam, fai, *opts)
+        assert run(tmp_path, 'chunks', sam, fai, '-p', '4', '--chunks', '5', *opts) == single
+
+
+# coverage of reads wrapping past the chromosome end is the same as the one of the original script
+def test_baseline(tmp_path):
+    for opts, expected in [([], 'expected_coverage.bed'), (['--compact'], 'expected_compact.bed')]:
+        run(tmp_path, 'coverage.bed', sam, fai, *opts)
+        assert filecmp.cmp(tmp_path / 'coverage.bed', os.path.join(data, expected), shallow=False)
+
+
+# an indexed bam file gives the same coverage as the sam file, also when it is not indexed
+def test_bam(tmp_path):
+    pysam = pytest.importorskip('pysam')
+    bam = str(tmp_path / 'reads.bam')
+    pysam.sort('-o', bam, sam)
+    unindexed = run(tmp_path, 'unindexed', bam, fai)
+    pysam.index(bam)
+    for opts in [[], ['--compact']]:
+        assert run(tmp_path, 'bam', bam, fai, *opts) == run(tmp_path, 'sam', sam, fai, *opts)
+    assert unindexed == run(tmp_path, 'sam', sam, fai)
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+
+import itertools as it
+import numpy as np
+import subprocess
+import random
+import sys
+import os
+root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(root, 'lib'))
+sys.path.append(os.path.join(root, 'heatmap_barplot'))
+import rnmp_library
+from composition import is_fasta, load_index
+from draw_heatmap import load_data
+
+script = os.path.join(root, 'heatmap_barplot', 'count_composition.py')
+
+fasta = '>chrM\nACGTTGCAAC\nGGTA\n'
+
+
+# open a pipe holding the text, like a fasta file given on stdin
+def pipe(text):
+    r, w = os.pipe()
+    with open(w, 'w') as fw:
+        fw.write(text)
+    return open(r)
+
+
+# fasta files are detected without consuming the handle, also from pipes
+def test_is_fasta(tmp_path):
+    fn = tmp_path / 'chrM.fa'
+    fn.write_text(fasta)
+    for fr in [open(fn), pipe(fasta)]:
+        with fr:
+            assert is_fasta(fr)
+            assert fr.read() == fasta
+    with pipe('chrM\t0\t1\n') as fr:
+        assert not is_fasta(fr)
+
+
+# index of a piped fasta is the same as the one of the file
+def test_load_index_pipe(tmp_path, monkeypatch):
+    monkeypatch.setattr(rnmp_library, 'cache_dir', str(tmp_path / 'cache'))
+    fn = tmp_path / 'chrM.fa'
+    fn.write_text(fasta)
+    with open(fn) as fr:
+        expected = load_index(fr, dists=(1,))
+    with pipe(fasta) as fr:
+        index = load_index(fr, dists=(1,))
+    assert index.keys() == expected.keys()
+    for k in index:
+        assert np.array_equal(index[k], expected[k])
+
+
+bases = 'ACGT'
+complement = {'A':'T', 'C':'G', 'G':'C', 'T':'A', 'N':'N'}
+sequence = 'ACGTTGCAACGGTANCCATGGACTTAGCATGCAAGTCCGA'
+dists = [1, 100]
+# offsets of each table from the rNMP, 5'->3' on the rNMP strand
+tables = {'mono':(0,), 'trinuc_nnr':(-2, -1, 0), 'trinuc_nrn':(-1, 0, 1), 'trinuc_rnn':(0, 1, 2)}
+for d in dists:
+    tables[f'dinuc_d{d}_nr'] = (-d, 0)
+    tables[f'dinuc_d{d}_rn'] = (0, d)
+# features grouped by the rNMP base, in the order of the plots
+features = {
+    'mono':list(bases),
+    'dinuc_nr':[n + r for r in bases for n in bases],
+    'dinuc_rn':[r + n for r in bases for n in bases],
+    'trinuc_nnr':[a + b + r for r in bases for b in bases for a in bases],
+    'trinuc_nrn':[a + r + b for r in bases for a in bases for b in bases],
+    'trinuc_rnn':[r + a + b for r in bases for a in bases for b in bases]
+}
+
+
+# feature list of a table, dinucleotide tables share the features of any distance
+def table_features(table):
+    return features['dinuc_' + table.rsplit('_', 1)[1] if table.startswith('dinuc') else table]
+
+
+# random rNMPs of two libraries, positions at both ends of the circular sequence are always included
+def write_libraries(tmp_path):
+    random.seed(3)
+    libs = {}
+    for name in ['FS1', 'FS2']:
+        rnmps = [(loc, st) for loc in [0, 1, len(sequence) - 2, len(sequence) - 1] for st in '+-']
+        rnmps += [(random.randrange(len(sequence)), random.choice('+-')) for _ in range(60)]
+        with open(tmp_path / f'{name}.bed', 'w') as fw:
+            for loc, st in rnmps:
+                fw.write(f'chrM\t{loc}\t{loc+1}\t.\t.\t{st}\n')
+        libs[name] = rnmps
+    return libs
+
+
+# count k-mers of each rNMP one by one, rNMPs on - strand are read on the complement backwards
+def brute_force(rnmps, offsets, strands):
+    counts = dict.fromkeys(map(''.join, it.product(bases, repeat=len(offsets))), 0)
+    for loc, st in rnmps:
+        if st not in strands:
+            continue
+        if st == '+':
+            kmer = ''.join(sequence[(loc + o) % len(sequence)] for o in offsets)
+        else:
+            kmer = ''.join(complement[sequence[(loc - o) % len(sequence)]] for o in offsets)
+        if kmer in counts:
+            counts[kmer] += 1
+    return counts
+
+
+# read an output table
+def read_table(fn):
+    with open(fn) as fr:
+        header = fr.readline().rstrip('\n').split('\t')
+        return header, {l.split('\t')[0]:l.rstrip('\n').split('\t')[1:] for l in fr}
+
+
+# counts of every table are the same as counting each rNMP, for both strands and each strand separately
+def test_counts(tmp_path):
+    libs = write_libraries(tmp_path)
+    (tmp_path / 'chrM.fa').write_text(f'>chrM\n{sequence[:25]}\n{sequence[25:]}\n')
+    (tmp_path / 'order.tsv').write_text('CD4T\tFS2\nHEK293T\tFS1\n')
+    for split, variants in [([], {'':'+-'}), (['--strand_split'], {'_light':'+', '_heavy':'-'})]:
+        out = tmp_path / ('split' if split else 'all')
+        subprocess.run(
+            [sys.executable, script, tmp_path / 'chrM.fa', tmp_path / 'FS1.bed', tmp_path / 'FS2.bed', '-o', out,
+             '--order', tmp_path / 'order.tsv', '--dist'] + [str(d) for d in dists] + split + ['--no_cache'],
+            check=True, capture_output=True
+        )
+        for suffix, strands in variants.items():
+            for table, offsets in tables.items():
+                header, rows = read_table(out / 'raw' / f'chrM_{table}{suffix}.raw')
+                assert header == ['Sample'] + table_features(table)
+                for name, rnmps in libs.items():
+                    expected = brute_force(rnmps, offsets, strands)
+                    assert [int(x) for x in rows[name]] == [expected[x] for x in header[1:]]
+                # normalized and sorted tables have the same columns, sorted tables are renamed in order
+                assert read_table(out / 'normalized' / f'chrM_{table}{suffix}.norm')[0] == header
+                tsv = out / 'tsv' / f'chrM_{table}{suffix}.tsv'
+                assert list(read_table(tsv)[1]) == ['CD4T-FS2', 'HEK293T-FS1']
+                # feature labels of the heatmap match the columns
+                with open(tsv) as fr:
+                    df, labels = load_data(fr)
+                assert [x.replace('U', 'T') for x in labels] == header[1:]
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import subprocess
+import sys
+import os
+
+root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(root, 'background_calculation'))
+from coverage_track import write_track, read_track, is_track
+
+scripts = os.path.join(root, 'background_calculation')
+data = os.path.join(root, 'tests', 'data', 'coverage')
+sizes = {'chrM':300, 'chr1':7}
+
+
+# random coverage of each chromosome and strand
+def coverages():
+    rng = np.random.default_rng(4)
+    return {(k, st):rng.integers(0, 2**32, v, dtype=np.uint32) for k, v in sizes.items() for st in '+-'}
+
+
+# check a loaded track has the same coverage
+def check(track, expected):
+    assert track.keys() == expected.keys()
+    for k, v in expected.items():
+        assert np.array_equal(track[k], v)
+
+
+# tracks are read back from files, memory mapped, and from pipes, both in binary and text mode
+def test_round_trip(tmp_path):
+    expected = coverages()
+    fn = tmp_path / 'reads.cov'
+    with open(fn, 'wb') as fw:
+        write_track(fw, expected, sizes)
+    for mode in ['rb', 'r']:
+        with open(fn, mode) as fr:
+            assert is_track(fr)
+            track = read_track(fr)
+            assert all(isinstance(x, np.memmap) for x in track.values())
+            check(track, expected)
+        r, w = os.pipe()
+        with open(w, 'wb') as fw:
+            write_track(fw, expected, sizes)
+        with open(r, mode) as fr:
+            assert is_track(fr)
+            check(read_track(fr), expected)
+    with open(os.path.join(data, 'expected_coverage.bed')) as fr:
+        assert not is_track(fr)
+
+
+# run a script on a text and a binary coverage of the same reads, output files in the working folders
+def run_both(tmp_path, script, *args, out=None):
+    outputs = []
+    for ext, opts in [('bed', []), ('cov', ['--binary'])]:
+        folder = tmp_path / ext
+        folder.mkdir()
+        subprocess.run(
+            [sys.executable, os.path.join(scripts, 'calculate_coverage.py'), os.path.join(data, 'reads.sam'),
+             os.path.join(data, 'chrM.fa.fai'), '-o', folder / f'reads.{ext}'] + opts,
+            check=True, capture_output=True
+        )
+        result = subprocess.run(
+            [sys.executable, os.path.join(scripts, script), folder / f'reads.{ext}'] + list(args),
+            check=True, capture_output=True, cwd=folder, env={**os.environ, 'MPLBACKEND':'Agg'}
+        )
+        outputs.append((folder / out).read_bytes() if out else result.stdout)
+    return outputs
+
+
+# binned coverage of draw.py is the same for text and binary coverage
+def test_draw(tmp_path):
+    text, binary = run_both(tmp_path, 'draw.py', os.path.join(data, 'chrM.fa.fai'), '-b', '20', '-t', '100', out='test.csv')
+    assert text == binary
+
+
+# 7S DNA coverage of calc_7s.py is the same for text and binary coverage
+def test_calc_7s(tmp_path):
+    text, binary = run_both(tmp_path, 'calc_7s.py')
+    assert text == binary
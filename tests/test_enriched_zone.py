@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+
+import subprocess
+import filecmp
+import numpy as np
+import pandas as pd
+import pytest
+import sys
+import os
+
+root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+script = os.path.join(root, 'enriched_zone', 'enriched_zone_analysis.py')
+data = os.path.join(root, 'tests', 'data', 'enriched_zone')
+libs = ['FS1', 'FS2', 'FS3', 'FS4']
+sys.path.append(os.path.join(root, 'enriched_zone'))
+from enriched_zone_analysis import permute_batch
+
+
+# run enriched_zone_analysis.py on the fixture libraries, cache is kept in tmp_path
+def run(tmp_path, *opts, beds=None, libinfo=os.path.join(data, 'libinfo.tsv')):
+    beds = beds or [os.path.join(data, f'{x}.bed') for x in libs]
+    os.makedirs(tmp_path, exist_ok=True)
+    out = str(tmp_path / 'ez')
+    env = dict(os.environ, RNMP_CACHE_DIR=str(tmp_path / 'cache'), MPLBACKEND='Agg')
+    subprocess.run(
+        [sys.executable, script] + beds + [os.path.join(data, 'chrM.fa.fai'), libinfo, '-o', out] + list(opts),
+        check=True, env=env, capture_output=True
+    )
+    return out
+
+
+# REZ table is the same as the original per-line implementation
+def test_rezs_baseline(tmp_path):
+    out = run(tmp_path)
+    assert filecmp.cmp(f'{out}_rezs.tsv', os.path.join(data, 'expected_rezs.tsv'), shallow=False)
+
+
+# cell types are read from a library store built with the library information
+def test_store_libinfo(tmp_path):
+    store = str(tmp_path / 'libraries.npz')
+    subprocess.run(
+        [sys.executable, os.path.join(root, 'lib', 'rnmp_library.py')] + [os.path.join(data, f'{x}.bed') for x in libs] + \
+        ['--libinfo', os.path.join(data, 'libinfo.tsv'), '-o', store, '--no_cache'],
+        check=True, capture_output=True
+    )
+    (tmp_path / 'empty.tsv').write_text('')
+    out = run(tmp_path, beds=[store], libinfo=str(tmp_path / 'empty.tsv'))
+    assert filecmp.cmp(f'{out}_rezs.tsv', os.path.join(data, 'expected_rezs.tsv'), shallow=False)
+
+
+# common REZ table is the same as the original groupby implementation, at a threshold with common REZs on both strands
+# the Sample column is the repr of the unique libraries, the fixture is the one of pandas 3
+@pytest.mark.skipif(int(pd.__version__.split('.')[0]) < 3, reason='Sample repr of the fixture is the one of pandas 3')
+def test_common_rezs_baseline(tmp_path):
+    out = run(tmp_path, '--sample_threshold', '0.5')
+    assert filecmp.cmp(f'{out}_common_rezs.tsv', os.path.join(data, 'expected_common_rezs.tsv'), shallow=False)
+
+
+# permutation test gives p-values and FDR of each common REZ
+def test_permutations(tmp_path):
+    out = run(tmp_path, '--permutations', '200', '--seed', '1')
+    with open(f'{out}_common_rezs.tsv') as fr:
+        header = fr.readline().rstrip('\n').split('\t')
+    assert header[-2:] == ['P_value', 'FDR']
+
+
+# permuted libraries exceed a common REZ only if all cell types are enriched
+def test_permutations_celltypes():
+    totals = np.array([[300, 300], [300, 300], [0, 0]])
+    task = (np.random.SeedSequence(1), 50, totals, np.array([0, 0, 1]), 1000, 100, 1, np.array([0, 1]), np.array([3, 7]), np.array([1, 1]))
+    assert list(permute_batch(task)) == [0, 0]
+    task = task[:3] + (np.array([0, 0, 0]),) + task[4:]
+    assert all(permute_batch(task) > 0)
+
+
+# permutations use the rNMPs loaded for the REZs, also when libraries are not cached
+def test_permutations_no_cache(tmp_path):
+    opts = ['--permutations', '200', '--seed', '1']
+    uncached = run(tmp_path / 'uncached', *opts, '--no_cache')
+    cached = run(tmp_path / 'cached', *opts)
+    assert filecmp.cmp(f'{uncached}_common_rezs.tsv', f'{cached}_common_rezs.tsv', shallow=False)
+
+
+# a bin size scanned with --sweep gives the same tables as -b
+def test_sweep_same_as_bin(tmp_path):
+    sweep = run(tmp_path / 'sweep', '--sweep', '200', '150')
+    for bin in [200, 150]:
+        single = run(tmp_path / f'b{bin}', '-b', str(bin))
+        for table in ['rezs', 'common_rezs']:
+            assert filecmp.cmp(f'{sweep}_b{bin}_{table}.tsv', f'{single}_{table}.tsv', shallow=False)
+
+
+# permutations are tested for each scanned bin size
+def test_sweep_permutations(tmp_path):
+    out = run(tmp_path, '--sweep', '200', '150', '--permutations', '50', '--seed', '1')
+    for bin in [200, 150]:
+        with open(f'{out}_b{bin}_common_rezs.tsv') as fr:
+            assert fr.readline().rstrip('\n').split('\t')[-2:] == ['P_value', 'FDR']
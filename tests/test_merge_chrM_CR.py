@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+import subprocess
+import random
+import sys
+import os
+
+script = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'preprocess', 'merge_chrM_CR.py')
+
+
+# write sorted random rNMPs of a sequence, reads of the same name may be in both files
+def write_bed(fn, name, size, n, reads):
+    records = sorted((random.randrange(size), random.choice('+-'), f'r{random.randrange(reads)}') for _ in range(n))
+    with open(fn, 'w') as fw:
+        for loc, st, rd in records:
+            fw.write(f'{name}\t{loc}\t{loc+1}\t{rd}\t.\t{st}\n')
+
+
+# streaming merge of a CR bed from stdin is the same as the in-memory merge
+def test_sorted_stdin(tmp_path):
+    random.seed(1)
+    write_bed(tmp_path / 'mt.bed', 'chrM', 16569, 2000, 600)
+    write_bed(tmp_path / 'cr.bed', 'chrM_CR', 1122, 500, 300)
+    subprocess.run([sys.executable, script, tmp_path / 'mt.bed', tmp_path / 'cr.bed', '-o', tmp_path / 'a.bed'], check=True, capture_output=True)
+    with open(tmp_path / 'cr.bed') as fr:
+        subprocess.run([sys.executable, script, tmp_path / 'mt.bed', '-', '--sorted', '-o', tmp_path / 'b.bed'], stdin=fr, check=True, capture_output=True)
+    assert (tmp_path / 'a.bed').read_text() == (tmp_path / 'b.bed').read_text()
+
+
+# unsorted input is an error
+def test_unsorted(tmp_path):
+    (tmp_path / 'mt.bed').write_text('chrM\t5\t6\tr1\t.\t+\nchrM\t1\t2\tr2\t.\t+\n')
+    (tmp_path / 'cr.bed').write_text('')
+    res = subprocess.run([sys.executable, script, tmp_path / 'mt.bed', tmp_path / 'cr.bed', '--sorted'], capture_output=True, text=True)
+    assert res.returncode != 0 and 'not sorted' in res.stderr
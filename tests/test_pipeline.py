@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'wrapper'))
+from pipeline import step, run_pipeline
+
+
+# one step in each of two stages, each writes a file
+def stage_steps(tmp_path, stages):
+    return [
+        step(f'{x}/touch', ['touch', str(tmp_path / f'{x}.txt')], [], [str(tmp_path / f'{x}.txt')])
+        for x in stages
+    ]
+
+
+# outputs of stages not selected in a run are kept
+def test_prune_keeps_unselected_stages(tmp_path):
+    log_dir = str(tmp_path / 'logs')
+    assert run_pipeline(stage_steps(tmp_path, ['a', 'b']), 2, log_dir)
+    assert run_pipeline(stage_steps(tmp_path, ['a']), 2, log_dir, keep=['b'])
+    assert (tmp_path / 'b.txt').exists()
+    assert (tmp_path / 'logs' / 'b_touch.json').exists()
+
+
+# outputs of steps removed from a selected stage are deleted
+def test_prune_removed_steps(tmp_path):
+    log_dir = str(tmp_path / 'logs')
+    assert run_pipeline(stage_steps(tmp_path, ['a', 'b']), 2, log_dir)
+    assert run_pipeline(stage_steps(tmp_path, ['a']), 2, log_dir)
+    assert (tmp_path / 'a.txt').exists()
+    assert not (tmp_path / 'b.txt').exists()
+    assert not (tmp_path / 'logs' / 'b_touch.json').exists()
+
+
+# a step after a rerun producer is skipped if the produced file did not change, declared dependencies force a rerun
+def test_rerun_by_content(tmp_path):
+    log_dir = str(tmp_path / 'logs')
+    src, mid = tmp_path / 'src.txt', tmp_path / 'mid.txt'
+    src.write_text('a\n')
+    steps = [
+        step('make', f'echo x > {mid}', [str(src)], [str(mid)]),
+        step('copy', ['cp', str(mid), str(tmp_path / 'copy.txt')], [str(mid)], [str(tmp_path / 'copy.txt')]),
+        step('touch', ['touch', str(tmp_path / 'touch.txt')], [], [str(tmp_path / 'touch.txt')], after=['make'])
+    ]
+    report = str(tmp_path / 'report.tsv')
+    assert run_pipeline(steps, 2, log_dir)
+    src.write_text('b\n')
+    assert run_pipeline(steps, 2, log_dir, report)
+    with open(report) as fr:
+        status = dict(l.split('\t')[:2] for l in fr.readlines()[1:])
+    assert status == {'make':'done', 'copy':'skipped', 'touch':'done'}
+
+
+# outputs a step no longer declares are deleted
+def test_prune_undeclared_outputs(tmp_path):
+    log_dir = str(tmp_path / 'logs')
+    x, y = tmp_path / 'x.txt', tmp_path / 'y.txt'
+    assert run_pipeline([step('a', ['touch', str(x), str(y)], [], [str(x), str(y)])], 1, log_dir)
+    assert run_pipeline([step('a', ['touch', str(x)], [], [str(x)])], 1, log_dir)
+    assert x.exists() and not y.exists()
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import subprocess
+import random
+import sys
+import os
+
+script = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'preprocess', 'process_extended_bed.py')
+
+
+# unsorted rNMPs on the extended genome, with ties of coordinate and strand
+def write_bed(fn, n):
+    random.seed(1)
+    with open(fn, 'w') as fw:
+        for i in range(n):
+            loc = random.randrange(200)
+            fw.write(f'chrM\t{loc}\t{loc+1}\tr{i}\t.\t{random.choice("+-")}\n')
+
+
+# run the script, input is piped through stdin
+def run(fn, *opts):
+    with open(fn) as fr:
+        return subprocess.run([sys.executable, script, '-', '-l', '150'] + list(opts), stdin=fr, check=True, capture_output=True).stdout
+
+
+# external sort with many levels of runs gives the same output as the in-memory sort
+def test_external(tmp_path):
+    fn = tmp_path / 'in.bed'
+    write_bed(fn, 5000)
+    # one line per run, more than 64 * 64 runs are merged into a second level
+    assert run(fn, '--external', '--max_memory', '0.000001') == run(fn)
+
+
+# sorted input is streamed with the same output
+def test_sorted(tmp_path):
+    fn = tmp_path / 'in.bed'
+    write_bed(fn, 500)
+    sorted_fn = tmp_path / 'sorted.bed'
+    sorted_fn.write_bytes(run(fn).replace(b'Done!\n', b''))
+    out = subprocess.run([sys.executable, script, sorted_fn, '-l', '150'], check=True, capture_output=True).stdout
+    assert out == sorted_fn.read_bytes() + b'Done!\n'
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+import subprocess
+import shutil
+import sys
+import os
+
+root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+script = os.path.join(root, 'rNMP_distribution', 'rNMP_distribution.py')
+data = os.path.join(root, 'tests', 'data', 'enriched_zone')
+fai = os.path.join(data, 'chrM.fa.fai')
+
+
+# copy fixture libraries into a folder
+def folder(path, libs):
+    path.mkdir()
+    for x in libs:
+        shutil.copy(os.path.join(data, f'{x}.bed'), path)
+    return str(path)
+
+
+# figures drawn on workers are collected into one pdf page for each library
+def test_pdf(tmp_path):
+    beds = folder(tmp_path / 'beds', ['FS1', 'FS2', 'FS3'])
+    subprocess.run(
+        [sys.executable, script, beds, fai, '--out_dir', tmp_path / 'out', '--pdf', tmp_path / 'all.pdf', '-p', '2', '--no_cache'],
+        check=True, capture_output=True, env={**os.environ, 'MPLBACKEND':'Agg'}
+    )
+    assert sorted(os.listdir(tmp_path / 'out')) == ['FS1.png', 'FS2.png', 'FS3.png']
+    assert (tmp_path / 'all.pdf').read_bytes().count(b'/Type /Page ') == 3
+
+
+# libraries of the same name in different folders are rejected
+def test_duplicate_names(tmp_path):
+    result = subprocess.run(
+        [sys.executable, script, folder(tmp_path / 'a', ['FS1', 'FS2']), folder(tmp_path / 'b', ['FS1']), fai,
+         '--out_dir', tmp_path / 'out', '--no_cache'],
+        capture_output=True, text=True
+    )
+    assert result.returncode == 2
+    assert 'Library FS1 is found in both' in result.stderr
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pandas as pd
+import subprocess
+import sys
+import os
+
+root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.append(os.path.join(root, 'lib'))
+from rnmp_library import load_libraries
+from region_profile import replication_profile
+
+data = os.path.join(root, 'tests', 'data', 'control_region')
+beds = [os.path.join(data, f'CR{i}.bed') for i in range(1, 5)]
+size = 16569
+
+
+# moving average of PPB at each position of a region, summing the counts within the flanks one by one
+def brute_force(fn, total, st, positions, flank):
+    counts = np.zeros(len(positions))
+    index = {x:i for i, x in enumerate(positions)}
+    with open(fn) as fr:
+        for l in fr:
+            ws = l.rstrip('\n').split('\t')
+            if ws[5] == st and int(ws[1]) in index:
+                counts[index[int(ws[1])]] += 1
+    return np.array([
+        counts[max(i - flank, 0):i + flank + 1].sum() for i in range(len(positions))
+    ]) / total / len(positions) / (flank * 2 + 1)
+
+
+# profiles of a region wrapping the origin and a region on - strand, the CR matrix equals the replication distribution
+def test_profile_regions(tmp_path):
+    (tmp_path / 'regions.bed').write_text('chrM\t16024\t576\tCR\t0\t+\nchrM\t5571\t5948\tOL\t0\t-\n')
+    subprocess.run(
+        [sys.executable, os.path.join(root, 'control_region', 'profile_regions.py'), os.path.join(data, 'total.tsv'),
+         tmp_path / 'regions.bed'] + beds + ['-o', tmp_path / 'out', '--no_cache'],
+        check=True, capture_output=True
+    )
+    total = dict(pd.read_csv(os.path.join(data, 'total.tsv'), sep='\t', header=None).values)
+    regions = {
+        'CR':np.concatenate([np.arange(16024, size), np.arange(576)]),
+        'OL':np.arange(5571, 5948)[::-1]
+    }
+    profiles = {}
+    for name, positions in regions.items():
+        df = pd.read_csv(tmp_path / 'out' / f'{name}.tsv', sep='\t', float_precision='round_trip')
+        assert list(df.columns[2:].astype(int)) == list(positions)
+        assert list(df.Library) == list(np.repeat(['CR1', 'CR2', 'CR3', 'CR4'], 2))
+        assert list(df.Strand) == ['Light', 'Heavy'] * 4
+        for (lib, st), row in zip(df[['Library', 'Strand']].values, df.values[:, 2:].astype(float)):
+            expected = brute_force(os.path.join(data, f'{lib}.bed'), total[lib], '+' if st == 'Light' else '-', positions, 25)
+            assert np.allclose(row, expected, rtol=1e-12, atol=0)
+        profiles[name] = df
+    # the same values as the profiles of replication_distribution.py, on both strands
+    libs = load_libraries([open(x) for x in beds], cache=False)
+    ppb = replication_profile([(k, v, st) for st in ['Light', 'Heavy'] for k, v in libs.items()], total, 25)
+    for (lib, st), row in zip(profiles['CR'][['Library', 'Strand']].values, profiles['CR'].values[:, 2:].astype(float)):
+        expected = ppb[(ppb.Library == lib) & (ppb.Strand == st)].sort_values(by='Position').Moving_avg.values
+        assert np.array_equal(row, expected)
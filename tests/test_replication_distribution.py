@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+
+import subprocess
+import pytest
+import gzip
+import sys
+import os
+
+root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+data = os.path.join(root, 'tests', 'data', 'control_region')
+beds = [os.path.join(data, f'CR{i}.bed') for i in range(1, 5)]
+
+
+# run a replication distribution script on the same libraries on both strands
+def run(tmp_path, script, flank, out):
+    subprocess.run(
+        [sys.executable, os.path.join(root, 'control_region', script), os.path.join(data, 'total.tsv'),
+         os.path.join(data, 'celltypes.tsv'), '--same'] + beds + ['--oppo'] + beds + ['-f', str(flank), '-o', out, '--no_cache'],
+        check=True, capture_output=True, cwd=tmp_path, env={**os.environ, 'MPLBACKEND':'Agg'}
+    )
+
+
+# csv files of each celltype and combined by celltypes are the same as the ones of the original scripts
+@pytest.mark.parametrize('flank', [5, 25, 100])
+def test_baseline(tmp_path, flank):
+    run(tmp_path, 'replication_distribution.py', flank, f'f{flank}')
+    run(tmp_path, 'replication_distribution_combined.py', flank, f'f{flank}_combined')
+    for name in ['CD4T', 'HEK293T', 'combined']:
+        with gzip.open(os.path.join(data, f'expected_f{flank}_{name}.csv.gz')) as fr:
+            expected = fr.read()
+        with open(tmp_path / f'f{flank}_{name}.csv', 'rb') as fr:
+            assert fr.read() == expected
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+import numpy as np
+import pytest
+import glob
+import sys
+import os
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))), 'lib'))
+import rnmp_library
+
+
+# truncated cache entries are misses, temporary files are not evicted
+def test_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(rnmp_library, 'cache_dir', str(tmp_path))
+    rnmp_library.cache_put('a', {'x':np.arange(10)})
+    assert (rnmp_library.cache_get('a')['x'] == np.arange(10)).all()
+    with open(tmp_path / 'a.npz', 'r+b') as fw:
+        fw.truncate(20)
+    assert rnmp_library.cache_get('a') is None
+    tmp = tmp_path / 'b.1.npz.tmp'
+    tmp.write_bytes(b'0' * 1024)
+    monkeypatch.setattr(rnmp_library, 'cache_size', 0)
+    rnmp_library.cache_evict()
+    assert tmp.exists()
+    assert not glob.glob(str(tmp_path / '*.npz'))
+
+
+# a store of another chromosome is rejected
+def test_store_chrom(tmp_path):
+    fn = str(tmp_path / 'libraries.npz')
+    lib = {'loc':np.array([1, 5]), 'end':np.array([2, 6]), 'plus':np.array([True, False])}
+    rnmp_library.write_store(fn, {'FS1':lib}, 'chrM')
+    assert (rnmp_library.read_store(fn, 'chrM')[0]['FS1']['loc'] == lib['loc']).all()
+    with pytest.raises(ValueError):
+        rnmp_library.read_store(fn, 'MT')
+
+
+# cell type and order of each library are saved in the store
+def test_store_info(tmp_path):
+    fn = str(tmp_path / 'libraries.npz')
+    lib = {'loc':np.array([1, 5]), 'end':np.array([2, 6]), 'plus':np.array([True, False])}
+    info = {'FS0':'CD4T', 'FS1':'HEK293T', 'FS2':'CD4T'}
+    rnmp_library.write_store(fn, {'FS1':lib, 'FS2':lib, 'FS3':lib}, 'chrM', info)
+    libs, stored = rnmp_library.read_store(fn, 'chrM')
+    assert list(libs) == ['FS1', 'FS2', 'FS3']
+    assert stored == {'FS1':('HEK293T', 1), 'FS2':('CD4T', 2)}
+    with open(fn) as fr:
+        binned, stored = rnmp_library.load_binned([fr], 10, 5, with_info=True)
+    assert stored['FS2'] == ('CD4T', 2)
+    assert binned['FS1']['+'].tolist() == [1, 0, 0]
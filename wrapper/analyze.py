@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+
+import argparse
+import shlex
+import glob
+import sys
+import os
+from pipeline import step, run_pipeline
+
+q = shlex.quote
+dists = ['1', '2', '3', '4', '5', '100']
+pats = ['nnr', 'nrn', 'rnn']
+stages = ['heatmap_barplot', 'strand_split', 'enriched_zone', 'control_region_figures', 'gene_analysis']
+# rNMP count of each library from bed line numbers
+mito_count = r"""wc -l *.bed | grep -v total | sed 's/.bed//;s/^ *//;s/ /\t/' | awk 'BEGIN{OFS="\t"}{print $2,$1}'"""
+
+
+# library name of a bed file, same as get_name in lib/rnmp_library.py
+def lib_name(fn):
+    return os.path.basename(fn).split('.')[0]
+
+
+# names of regions in a bed file, in order
+def region_names(fn):
+    names = []
+    with open(fn) as fr:
+        for l in fr:
+            ws = l.rstrip('\n').split('\t')
+            if len(ws) > 3 and ws[3] not in names:
+                names.append(ws[3])
+    return names
+
+
+# grep that only fails on errors, not on empty output
+def grep(args, fi, fo):
+    return f'{{ grep {args} {q(fi)} || [ $? -eq 1 ]; }} > {q(fo)}'
+
+
+# count rNMP composition of all libraries and draw heatmaps and barplots
+# sts: [''] for all rNMPs, ['_light', '_heavy'] for rNMPs on each strand
+def heatmap_steps(tag, scripts, genome, beds, order, out, plots, sts=('',)):
+    steps = []
+    tables = ['mono'] + [f'dinuc_d{d}_{ty}' for d in dists for ty in ['nr', 'rn']] + [f'trinuc_{p}' for p in pats]
+    bgs = {x:f'{out}/bg/chrM_{x.rsplit("_", 1)[0] if x != "mono" else x}' for x in tables}
+    raws = {(x, st):f'{out}/raw/chrM_{x}{st}.raw' for x in tables for st in sts}
+    tsvs = {(x, st):(f'{out}/tsv/chrM_{x}{st}.tsv', f'{bgs[x]}{st}.raw') for x in tables for st in sts}
+    outputs = list(raws.values()) + [x for pair in tsvs.values() for x in pair] + \
+        [f'{out}/tsv/chrM_mono{x}{st}.tsv' for x in ['_sum1', ''] for st in sts] + \
+        [f'{out}/tsv/chrM_mono{st}_raw.tsv' for st in sts]
+    # count all libraries at once
+    steps.append(step(
+        f'{tag}/composition',
+        [f'{scripts}/heatmap_barplot/count_composition.py', genome] + beds + ['-o', out, '--order', order] + \
+            (['--strand_split'] if sts != ('',) else []),
+        [genome, order] + beds, sorted(set(outputs))
+    ))
+    # draw heatmaps
+    for (name, st), (tsv, bg) in tsvs.items():
+        annot = ['--no_annot'] if name.startswith('trinuc') else []
+        steps.append(step(
+            f'{tag}/heatmap/{name}{st}',
+            [f'{scripts}/heatmap_barplot/draw_heatmap.py', tsv, '-b', bg, '-o', f'{plots}/chrM_{name}{st}.png'] + annot + \
+                ['--palette', 'RdBu_r'],
+            [tsv, bg], [f'{plots}/chrM_{name}{st}.png']
+        ))
+    # draw barplots
+    for st in sts:
+        for name, tsv in [('normalized', f'{out}/tsv/chrM_mono{st}.tsv'), ('raw', f'{out}/tsv/chrM_mono_sum1{st}.tsv')]:
+            steps.append(step(
+                f'{tag}/barplot_{name}{st}',
+                [f'{scripts}/heatmap_barplot/generate_bar_plot.py', tsv, '-o', f'{plots}/chrM_barplot_{name}{st}.png'],
+                [tsv], [f'{plots}/chrM_barplot_{name}{st}.png']
+            ))
+    return steps, raws, tsvs
+
+
+# heatmaps and barplots of all libraries
+def heatmap_barplot_steps(scripts, genome, beds, order, out, plots):
+    steps, _, tsvs = heatmap_steps('heatmap_barplot', scripts, genome, beds, order, out, plots)
+    tsv, bg = tsvs[('trinuc_nnr', '')]
+    steps.append(step(
+        'heatmap_barplot/heatmap/trinuc_nnr_for_crop',
+        [
+            f'{scripts}/heatmap_barplot/draw_heatmap.py', tsv, '-b', bg,
+            '-o', f'{plots}/chrM_trinuc_nnr_for_crop.png', '--no_annot', '--palette', 'RdBu_r'
+        ],
+        [tsv, bg], [f'{plots}/chrM_trinuc_nnr_for_crop.png']
+    ))
+    return steps
+
+
+# heatmaps and barplots of light and heavy strand rNMPs
+# counts: rNMP count of each strand and library from split_strands.py
+def strand_split_steps(scripts, genome, beds, order, counts, out, plots):
+    steps, raws, _ = heatmap_steps('strand_split', scripts, genome, beds, order, out, plots, ('_light', '_heavy'))
+    # light/heavy comparison
+    for name, annot in [('chrM_count', ['--no_annot']), ('chrM_count_annot', [])]:
+        steps.append(step(
+            f'strand_split/{name}',
+            [f'{scripts}/heatmap_barplot/strand_split_plot.py', counts, order, '-o', f'{plots}/{name}.png'] + annot,
+            [counts, order], [f'{plots}/{name}.png']
+        ))
+    # contribution for strand split
+    inputs = [raws[('mono', '_light')], raws[('mono', '_heavy')], f'{out}/bg/chrM_mono_light.raw', f'{out}/bg/chrM_mono_heavy.raw', order]
+    steps.append(step(
+        'strand_split/contribution',
+        [f'{scripts}/heatmap_barplot/strand_split_contribution.py'] + inputs + ['-o', f'{plots}/strand_split'],
+        inputs
+    ))
+    return steps
+
+
+# rNMPs in control region elements
+def control_region_steps(scripts, genome, beds, order, mito, out, plots):
+    steps = []
+    bg = f'{scripts}/control_region/bg'
+    chipseq = sorted(glob.glob(f'{scripts}/control_region/chipseq/*.bed'))
+    beds = [x for x in beds if 'RD' not in os.path.basename(x)]
+    regions = ['CR', 'OH', 'OL']
+    # intersect and separate CR, OH and OL
+    for bed in beds:
+        fn = os.path.basename(bed)
+        cmds = []
+        outputs = []
+        for st in ['same', 'oppo']:
+            inter = f'{out}/bed_{st}/{fn}'
+            cmds.append(f'bedtools intersect -a {q(bg)}/{st}.bed -b {q(bed)} -s > {q(inter)}')
+            outputs.append(inter)
+            for region in regions:
+                cmds.append(grep(region, inter, f'{out}/{st}/bed_{region}/{fn}'))
+                outputs.append(f'{out}/{st}/bed_{region}/{fn}')
+        steps.append(step(f'control_region_figures/intersect/{lib_name(bed)}', ' && '.join(cmds), [bed], outputs))
+    for st in ['same', 'oppo']:
+        for region in regions:
+            tag = f'control_region_figures/{st}/{region}'
+            region_beds = [f'{out}/{st}/bed_{region}/{os.path.basename(x)}' for x in beds]
+            raw = f'{out}/{st}/raw/{region}_mono.raw'
+            tsv = f'{out}/{st}/tsv/{region}_mono.tsv'
+            # count mono
+            steps.append(step(
+                f'{tag}/composition',
+                [f'{scripts}/heatmap_barplot/count_composition.py', genome] + region_beds + [
+                    '-o', f'{out}/{st}', '--order', order, '--tables', 'mono', '--bg', f'{bg}/{st}.tsv', '--name', region
+                ],
+                [genome, order, f'{bg}/{st}.tsv'] + region_beds, [raw, tsv]
+            ))
+            steps.append(step(
+                f'{tag}/heatmap',
+                [
+                    f'{scripts}/heatmap_barplot/draw_heatmap.py', tsv, '-b', f'{bg}/{st}.tsv', '--background_chrom', region,
+                    '--palette', 'RdBu_r', '-o', f'{plots}/{st}/{region}'
+                ],
+                [tsv]
+            ))
+            steps.append(step(
+                f'{tag}/barplot',
+                [f'{scripts}/heatmap_barplot/generate_bar_plot.py', tsv, '-o', f'{plots}/{st}/{region}_barplot'],
+                [tsv]
+            ))
+    # control region distribution
+    same = [f'{out}/same/bed_CR/{os.path.basename(x)}' for x in beds]
+    oppo = [f'{out}/oppo/bed_CR/{os.path.basename(x)}' for x in beds]
+    libs = ['--same'] + same + ['--oppo'] + oppo
+    for name, script, opts in [
+            ('CR', 'replication_distribution.py', []),
+            ('all_wt', 'replication_distribution_combined.py', []),
+            ('all_hek', 'replication_distribution_combined.py', \
+                ['--selected', 'HEK293T', 'RNH2A-KO T3-8', 'RNH2A-KO T3-17', '--palette', 'Set2']),
+            ('with_chipseq', 'replication_distribution_combined_vs_chipseq.py', chipseq)
+        ]:
+        steps.append(step(
+            f'control_region_figures/distribution/{name}',
+            [f'{scripts}/control_region/{script}', mito, order] + opts + libs + ['-o', f'{plots}/distribution/{name}'],
+            [mito, order] + same + oppo
+        ))
+    # PPB profiles of all regions of interest
+    profiles = f'{scripts}/control_region/regions.bed'
+    steps.append(step(
+        'control_region_figures/profiles',
+        [f'{scripts}/control_region/profile_regions.py', mito, profiles] + beds + ['-o', f'{out}/profiles'],
+        [mito, profiles] + beds, [f'{out}/profiles/{x}.tsv' for x in region_names(profiles)]
+    ))
+    # compare strand bias
+    for region in regions:
+        raws = [f'{out}/same/raw/{region}_mono.raw', f'{out}/oppo/raw/{region}_mono.raw']
+        for name, annot in [(f'{region}_strands', ['--no_annot']), (f'{region}_strands_annot', [])]:
+            steps.append(step(
+                f'control_region_figures/compare_strands/{name}',
+                [f'{scripts}/control_region/compare_strands.py'] + raws + [order, '-o', f'{plots}/{name}'] + annot,
+                raws + [order]
+            ))
+        steps.append(step(
+            f'control_region_figures/contribution/{region}',
+            [f'{scripts}/heatmap_barplot/strand_split_contribution.py'] + raws + \
+                [f'{bg}/same.tsv', f'{bg}/oppo.tsv', order, '--chrom', region, '-o', f'{plots}/{region}_strand_bias'],
+            raws + [order]
+        ))
+    return steps
+
+
+# rNMPs in genes
+def gene_analysis_steps(scripts, genome, beds, mito, out, plots):
+    steps = []
+    folder = f'{scripts}/gene_analysis'
+    order = f'{folder}/order_human.tsv'
+    types = ['cds', 'noncoding', 'random']
+    control = sorted(glob.glob(f'{folder}/control_bed/RD*.bed'))
+    gtfs = [f'{folder}/ref/{ty}.gtf' for ty in types]
+    raws = {(ty, st):f'{out}/raw/{ty}_{st}.raw' for ty in types for st in ['template', 'nontemplate']}
+    # count rNMPs of each gene on template and nontemplate strands
+    steps.append(step(
+        'gene_analysis/count_genes',
+        [f'{folder}/count_genes.py', genome] + beds + control + ['-g'] + gtfs + ['-o', f'{out}/raw'],
+        [genome] + beds + control + gtfs, raws.values()
+    ))
+    # add gene information and remove ND6
+    for (ty, st), raw in raws.items():
+        info = f'{out}/info_with_ND6/{ty}_{st}.tsv'
+        # background of each gene is counted from the k-mer index of the genome
+        inputs = [raw, order, f'{folder}/ref/{ty}.gtf', mito, genome]
+        steps.append(step(
+            f'gene_analysis/info/{ty}_{st}',
+            [f'{folder}/add_info.py'] + inputs + ['-c', '2', '-s', st, '-o', info],
+            inputs, [info]
+        ))
+        steps.append(step(
+            f'gene_analysis/remove_ND6/{ty}_{st}', grep('-v ND6', info, f'{out}/info/{ty}_{st}.tsv'),
+            [info], [f'{out}/info/{ty}_{st}.tsv']
+        ))
+        steps.append(step(
+            f'gene_analysis/heatmap/{ty}_{st}',
+            [f'{folder}/draw_heatmap.py', f'{out}/info/{ty}_{st}.tsv', '--no_cbar', '-o', f'{plots}/heatmap/{ty}_{st}'],
+            [f'{out}/info/{ty}_{st}.tsv']
+        ))
+    for st in ['template', 'nontemplate']:
+        # barplot of cds and noncoding genes
+        cds = f'{out}/info/cds_{st}.tsv'
+        noncoding = f'{out}/info/noncoding_{st}.tsv'
+        merged = f'{out}/info/{st}.tsv'
+        steps.append(step(
+            f'gene_analysis/merge/{st}',
+            f"cat {q(cds)} > {q(merged)} && tail -n +2 {q(noncoding)} >> {q(merged)} && sed -i 's/MT-//g' {q(merged)}",
+            [cds, noncoding], [merged]
+        ))
+        steps.append(step(
+            f'gene_analysis/barplot/{st}',
+            [f'{folder}/draw_barplot.py', merged, f'{folder}/gene_names.tsv', '-o', f'{plots}/barplot/{st}'],
+            [merged, f'{folder}/gene_names.tsv']
+        ))
+        # regression plot
+        steps.append(step(
+            f'gene_analysis/regplot/cds_{st}',
+            [f'{folder}/draw_regplot.py', cds, '-o', f'{plots}/regplot/cds_{st}'], [cds]
+        ))
+    # regplot for C and G
+    steps.append(step(
+        'gene_analysis/regplot_cg',
+        [f'{folder}/draw_regplot_cg.py', f'{out}/info/cds_nontemplate.tsv', '-o', f'{plots}/regplot_cg/cds_nontemplate'],
+        [f'{out}/info/cds_nontemplate.tsv']
+    ))
+    return steps
+
+
+# all steps of the analysis
+def analysis_steps(scripts, bed_folder, order, output, selected, jobs=1):
+    genome = f'{scripts}/refseq/hg38_chrM.fa'
+    beds = sorted(glob.glob(f'{bed_folder}/*.bed'))
+    control = sorted(glob.glob(f'{scripts}/gene_analysis/control_bed/*.bed'))
+    mito = f'{output}/mito_count.tsv'
+    plots = f'{output}/plots'
+    steps = []
+    # count rNMPs in each library
+    steps.append(step(
+        'mito_count',
+        f'cd {q(bed_folder)} && {mito_count} > {q(mito)} && cd {q(scripts)}/gene_analysis/control_bed && {mito_count} >> {q(mito)}',
+        beds + control, [mito]
+    ))
+    # convert libraries into a columnar store
+    steps.append(step(
+        'library_store',
+        [f'{scripts}/lib/rnmp_library.py'] + beds + ['--libinfo', order, '-o', f'{output}/libraries.npz'],
+        beds + [order], [f'{output}/libraries.npz']
+    ))
+    if 'heatmap_barplot' in selected:
+        steps += heatmap_barplot_steps(
+            scripts, genome, beds, order, f'{output}/heatmap_barplot', f'{plots}/heatmap_barplot'
+        )
+    if 'strand_split' in selected:
+        # rNMP counts of each strand
+        steps.append(step(
+            'strand_split/strand_counts',
+            [f'{scripts}/heatmap_barplot/split_strands.py'] + beds + ['-c', f'{output}/strand_counts.tsv', '-p', str(jobs)],
+            beds, [f'{output}/strand_counts.tsv']
+        ))
+        steps += strand_split_steps(
+            scripts, genome, beds, order, f'{output}/strand_counts.tsv', f'{output}/strand_split', f'{plots}/strand_split'
+        )
+    if 'enriched_zone' in selected:
+        rezs = f'{plots}/enriched_zone/chrM'
+        steps.append(step(
+            'enriched_zone',
+            [
+                f'{scripts}/enriched_zone/enriched_zone_analysis.py', f'{output}/libraries.npz',
+                f'{genome}.fai', order, '-o', rezs
+            ],
+            [f'{output}/libraries.npz', order], [f'{rezs}_rezs.tsv', f'{rezs}_common_rezs.tsv']
+        ))
+    if 'control_region_figures' in selected:
+        steps += control_region_steps(
+            scripts, genome, beds, order, mito,
+            f'{output}/control_region_figures', f'{plots}/control_region_figures'
+        )
+    if 'gene_analysis' in selected:
+        steps += gene_analysis_steps(
+            scripts, genome, beds, mito, f'{output}/gene_analysis', f'{plots}/gene_analysis'
+        )
+    return steps
+
+
+# output folders of the analysis
+def make_folders(output):
+    folders = ['logs', 'plots/enriched_zone']
+    for base in ['heatmap_barplot', 'strand_split']:
+        folders += [f'{base}/{x}' for x in ['raw', 'normalized', 'tsv', 'bg']] + [f'plots/{base}']
+    folders += [f'control_region_figures/{x}' for x in ['bed_same', 'bed_oppo', 'profiles']]
+    folders += [f'control_region_figures/{st}/bed_{region}' for st in ['same', 'oppo'] for region in ['CR', 'OH', 'OL']]
+    folders += [f'plots/control_region_figures/{x}' for x in ['distribution', 'same', 'oppo']]
+    folders += [f'gene_analysis/{x}' for x in ['raw', 'info', 'info_with_ND6']]
+    folders += [f'plots/gene_analysis/{x}' for x in ['heatmap', 'barplot', 'regplot', 'regplot_cg']]
+    for folder in folders:
+        os.makedirs(f'{output}/{folder}', exist_ok=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the rNMP mtDNA analysis as a pipeline of steps on a bounded worker pool. ' + \
+        'Steps are rerun only if their command, input contents or scripts changed, or if a step declared to run before them was rerun. ' + \
+        'Outputs of removed libraries in the selected stages are deleted.')
+    parser.add_argument('bed_folder', help='Folder of rNMP incorporation bed files')
+    parser.add_argument('order', help='Library information')
+    parser.add_argument('output', help='Output folder')
+    parser.add_argument('-j', type=int, default=os.cpu_count(), help='Maximum number of concurrent steps, (number of cpus)')
+    parser.add_argument('--stages', default=stages, nargs='+', choices=stages, help='Stages to run, (all)')
+    parser.add_argument('--force', action='store_true', help='Run all steps even if they are up to date')
+    parser.add_argument('--dry_run', action='store_true', help='Only print the steps to run')
+    args = parser.parse_args()
+
+    scripts = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    output = os.path.abspath(args.output)
+    os.makedirs(output, exist_ok=True)
+    make_folders(output)
+    steps = analysis_steps(
+        scripts, os.path.abspath(args.bed_folder),
+        os.path.abspath(args.order), output, args.stages, args.j
+    )
+
+    # per-step logs and records are kept in logs/steps, the summary in logs/pipeline.tsv
+    # outputs of stages not selected are kept
+    ok = run_pipeline(
+        steps, args.j, f'{output}/logs/steps', f'{output}/logs/pipeline.tsv', args.force, args.dry_run,
+        [x for x in stages if x not in args.stages]
+    )
+    if not ok:
+        print(f'Some steps failed, see {output}/logs/pipeline.tsv')
+        sys.exit(1)
+
+    print('Done!')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import subprocess
+import hashlib
+import shlex
+import glob
+import json
+import time
+import os
+
+
+# a pipeline step, cmd is an argument list or a bash command line
+def step(name, cmd, inputs=(), outputs=(), after=()):
+    return {'name':name, 'cmd':cmd, 'inputs':list(inputs), 'outputs':list(outputs), 'after':list(after)}
+
+
+# command line of a step
+def cmd_line(s):
+    return s['cmd'] if isinstance(s['cmd'], str) else shlex.join(s['cmd'])
+
+
+# per-step file in the log folder
+def step_file(log_dir, name, ext):
+    return os.path.join(log_dir, name.replace('/', '_') + ext)
+
+
+# dependencies of each step: declared ones and the producers of its inputs
+def build_graph(steps):
+    names = [s['name'] for s in steps]
+    assert len(names) == len(set(names)), 'Step names should be unique'
+    producers = {}
+    for s in steps:
+        for x in s['outputs']:
+            producers[x] = s['name']
+    deps = {}
+    for s in steps:
+        d = set(s['after']) | {producers[x] for x in s['inputs'] if x in producers}
+        d.discard(s['name'])
+        assert d <= set(names), f'Unknown dependencies of {s["name"]}: {d - set(names)}'
+        deps[s['name']] = d
+    # check cycles
+    done = set()
+    remaining = set(names)
+    while remaining:
+        ready = {x for x in remaining if deps[x] <= done}
+        assert ready, f'Cyclic dependencies among: {sorted(remaining)}'
+        done |= ready
+        remaining -= ready
+    return deps
+
+
+# files matched by paths or glob patterns, None if any of them is missing
+def expand(paths):
+    files = []
+    for p in paths:
+        if glob.has_magic(p):
+            matched = glob.glob(p)
+        else:
+            matched = [p] if os.path.exists(p) else []
+        if not matched:
+            return None
+        files += matched
+    return files
+
+
+# files matched by each path or glob pattern, missing ones are ignored
+def expand_each(paths):
+    return [x for p in paths for x in (expand([p]) or [])]
+
+
+# fingerprint of a file: size, modification time and content hash
+# the hash of the last fingerprint is reused if size and modification time are the same
+def fingerprint(fn, last=None):
+    st = os.stat(fn)
+    if last and last[:2] == [st.st_size, st.st_mtime_ns]:
+        return last
+    h = hashlib.sha1()
+    with open(fn, 'rb') as fr:
+        for chunk in iter(lambda: fr.read(1 << 20), b''):
+            h.update(chunk)
+    return [st.st_size, st.st_mtime_ns, h.hexdigest()]
+
+
+# files a step depends on: its inputs and the script it runs
+def dependencies(s):
+    files = expand_each(s['inputs'])
+    if not isinstance(s['cmd'], str) and os.path.isfile(s['cmd'][0]):
+        files.append(s['cmd'][0])
+    return sorted(set(files))
+
+
+# fingerprints of all files a step depends on
+def fingerprints(s, last=None):
+    last = last or {}
+    return {x:fingerprint(x, last.get(x)) for x in dependencies(s)}
+
+
+# a step is up to date if it succeeded with the same command, its outputs exist
+# and the contents of its inputs have not changed since
+def is_fresh(s, record):
+    try:
+        with open(record) as fr:
+            last = json.load(fr)
+    except (OSError, ValueError):
+        return False
+    if last.get('cmd') != cmd_line(s) or last.get('exit') != 0 or expand(s['outputs']) is None:
+        return False
+    inputs = last.get('inputs', {})
+    current = fingerprints(s, inputs)
+    if current.keys() != inputs.keys() or any(current[x][2] != inputs[x][2] for x in current):
+        return False
+    # keep new modification times so that unchanged files are not hashed again
+    if current != inputs:
+        last['inputs'] = current
+        with open(record, 'w') as fw:
+            json.dump(last, fw)
+    return True
+
+
+# remove outputs and records of steps that are no longer in the pipeline and outputs steps no longer declare,
+# e.g. files of removed libraries
+# steps under the kept prefixes (e.g. stages not selected in this run) are left untouched
+def prune(steps, log_dir, keep=()):
+    current = {step_file(log_dir, s['name'], '.json'):set(s['outputs']) for s in steps}
+    kept = tuple(step_file(log_dir, x, '') for x in keep)
+    for record in glob.glob(os.path.join(glob.escape(log_dir), '*.json')):
+        if record not in current and any(record == x + '.json' or record.startswith(x + '_') for x in kept):
+            continue
+        try:
+            with open(record) as fr:
+                outputs = json.load(fr).get('outputs', [])
+        except (OSError, ValueError):
+            outputs = []
+        # outputs the step does not generate any more
+        for x in expand_each([x for x in outputs if x not in current.get(record, ())]):
+            if os.path.isfile(x):
+                os.remove(x)
+        if record in current:
+            continue
+        os.remove(record)
+        log = record[:-5] + '.log'
+        if os.path.exists(log):
+            os.remove(log)
+        print(f'[pruned] {os.path.basename(record)[:-5]}')
+
+
+# run a step in a subprocess, record its exit status, wall time and peak RSS
+def run_step(s, log_dir):
+    for x in s['outputs']:
+        if not glob.has_magic(x):
+            os.makedirs(os.path.dirname(x) or '.', exist_ok=True)
+    # inputs are fingerprinted before the step runs
+    inputs = fingerprints(s)
+    cmd = s['cmd']
+    if isinstance(cmd, str):
+        cmd = ['bash', '-c', cmd]
+    start = time.monotonic()
+    with open(step_file(log_dir, s['name'], '.log'), 'w') as fw:
+        fw.write(cmd_line(s) + '\n')
+        fw.flush()
+        try:
+            p = subprocess.Popen(cmd, stdout=fw, stderr=subprocess.STDOUT)
+        except OSError as e:
+            fw.write(f'{e}\n')
+            code, rss = 127, 0
+        else:
+            # wait4 gives the resource usage of the step and the processes it waited for
+            _, status, usage = os.wait4(p.pid, 0)
+            p.returncode = code = os.waitstatus_to_exitcode(status)
+            rss = usage.ru_maxrss / 1024
+    record = {
+        'cmd':cmd_line(s), 'exit':code,
+        'wall_time':round(time.monotonic() - start, 3), 'peak_rss':round(rss, 1),
+        'inputs':inputs, 'outputs':s['outputs']
+    }
+    with open(step_file(log_dir, s['name'], '.json'), 'w') as fw:
+        json.dump(record, fw)
+    record['status'] = 'done' if code == 0 else 'failed'
+    del record['inputs']
+    return record
+
+
+# output a step result
+def report_line(name, r):
+    fields = [name, r['status'], r.get('exit', ''), r.get('wall_time', ''), r.get('peak_rss', '')]
+    return '\t'.join(str(x) for x in fields)
+
+
+# run steps after their dependencies on at most jobs workers
+# up-to-date steps are skipped, steps after failed ones are blocked
+# steps named under the keep prefixes are not pruned even if they are not in steps
+def run_pipeline(steps, jobs, log_dir, report=None, force=False, dry_run=False, keep=()):
+    deps = build_graph(steps)
+    by_name = {s['name']:s for s in steps}
+    os.makedirs(log_dir, exist_ok=True)
+    if not dry_run:
+        prune(steps, log_dir, keep)
+    results = {}
+    running = {}
+    with ThreadPoolExecutor(max(jobs, 1)) as pool:
+        while len(results) < len(steps):
+            # resolve every ready step that does not need a worker
+            changed = True
+            while changed:
+                changed = False
+                for name, s in by_name.items():
+                    if name in results or name in running.values() or not deps[name] <= results.keys():
+                        continue
+                    states = {results[x]['status'] for x in deps[name]}
+                    # outputs of rerun steps are checked by their fingerprints, declared dependencies force a rerun
+                    after = {results[x]['status'] for x in s['after']}
+                    if states & {'failed', 'blocked'}:
+                        results[name] = {'status':'blocked'}
+                    elif not force and 'done' not in after and 'planned' not in states and \
+                            is_fresh(s, step_file(log_dir, name, '.json')):
+                        results[name] = {'status':'skipped'}
+                    elif dry_run:
+                        results[name] = {'status':'planned'}
+                        print(f'[planned] {name}: {cmd_line(s)}')
+                    else:
+                        running[pool.submit(run_step, s, log_dir)] = name
+                        continue
+                    changed = True
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for f in done:
+                name = running.pop(f)
+                results[name] = f.result()
+                print(report_line(name, results[name]), flush=True)
+    if report:
+        with open(report, 'w') as fw:
+            fw.write('Step\tStatus\tExit\tWall_time(s)\tPeak_RSS(MB)\n')
+            for s in steps:
+                fw.write(report_line(s['name'], results[s['name']]) + '\n')
+    return all(r['status'] != 'failed' and r['status'] != 'blocked' for r in results.values())